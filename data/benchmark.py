@@ -0,0 +1,359 @@
+"""
+Benchmarks of the simulation hot path. Every case of a matrix of
+backends, grid sizes, densities and param sets is run in a fresh worker
+process (so peak RSS belongs to that case alone), one case at a time (so
+cases don't compete for cores), and the results are written as JSON.
+
+For each case the report holds the ticks per second and ns per cell of
+update, the cost of a get_neighbors call, peak RSS and the tracemalloc
+high-water mark of a tick. With draw enabled the display worlds are
+benchmarked instead and the cost of draw and Gameplay.report is added;
+that needs pygame and the game's resources, so run it from the top
+directory of the game.
+
+Comparing a result file against an earlier one reports the cases whose
+speed changed by more than a threshold.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from . import headless
+
+
+BACKENDS = {
+        "dict": {"engine": "dict", "update mode": "scan"},
+        "dict-sparse": {"engine": "dict", "update mode": "sparse"},
+        "dict-random": {"engine": "dict", "update mode": "random"},
+        "array-scan": {"engine": "array", "update mode": "scan"},
+        "array-sparse": {"engine": "array", "update mode": "sparse"},
+        "array-random": {"engine": "array", "update mode": "random"},
+        "array-vectorized": {"engine": "array", "update mode": "vectorized"},
+        "array-chromatic": {"engine": "array", "update mode": "chromatic"},
+        "partitioned": {"engine": "partitioned", "update mode": "vectorized"}}
+
+#Cell-by-cell backends run Python code for every cell, so the largest
+#grids are left to the vectorized update unless the spec says otherwise.
+DEFAULT_SPEC = {
+        "backends": ["dict", "dict-sparse", "dict-random", "array-scan",
+                          "array-sparse", "array-random", "array-vectorized",
+                          "array-chromatic", "partitioned"],
+        "sizes": ["120x64", "512x512", "1024x1024", "4096x4096"],
+        "densities": [[0.5, 0.02], [0.2, 0.05], [0.01, 0.001]],
+        "param sets": {
+                "default": {},
+                "fast breeding": {"fish reproduce age": 1,
+                                          "shark reproduce age": 2,
+                                          "shark starve time": 4}},
+        "max cells": {"dict": 1024 * 1024, "dict-sparse": 1024 * 1024,
+                            "dict-random": 1024 * 1024,
+                            "array-scan": 1024 * 1024, "array-sparse": 1024 * 1024,
+                            "array-random": 1024 * 1024},
+        "seconds": 2.0,
+        "min ticks": 3,
+        "max ticks": 200,
+        "render mode": "dirty",
+        "seed": 1}
+
+
+def parse_size(text):
+    columns, rows = text.lower().split("x")
+    return int(columns), int(rows)
+
+
+def make_cases(spec):
+    """Return a list of case dicts for every combination in spec."""
+    cases = []
+    for backend in spec["backends"]:
+        max_cells = spec["max cells"].get(backend)
+        for size in spec["sizes"]:
+            columns, rows = parse_size(size)
+            if max_cells is not None and columns * rows > max_cells:
+                continue
+            for fish_density, shark_density in spec["densities"]:
+                for name in sorted(spec["param sets"]):
+                    cases.append({
+                            "backend": backend,
+                            "columns": columns,
+                            "rows": rows,
+                            "fish density": fish_density,
+                            "shark density": shark_density,
+                            "param set": name})
+    return cases
+
+
+def case_key(case):
+    return json.dumps([case["backend"], case["columns"], case["rows"],
+                               case["fish density"], case["shark density"],
+                               case["param set"]])
+
+
+def case_params(case, spec):
+    params = headless.make_params(BACKENDS[case["backend"]])
+    params.update(spec["param sets"][case["param set"]])
+    params.update({
+            "columns": case["columns"],
+            "rows": case["rows"],
+            "fish density": case["fish density"],
+            "shark density": case["shark density"],
+            "seed": spec["seed"]})
+    return params
+
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #Linux reports kilobytes, macOS bytes.
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak
+
+
+def time_ticks(world, spec):
+    """Run ticks until the time budget is spent; return (ticks, seconds)."""
+    ticks = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while ticks < spec["max ticks"] and (ticks < spec["min ticks"] or
+                                                       elapsed < spec["seconds"]):
+        world.update()
+        ticks += 1
+        elapsed = time.perf_counter() - start
+    return ticks, elapsed
+
+
+def time_neighbors(world, rng, calls=10000):
+    """Return the mean ns per get_neighbors call over random cells."""
+    if hasattr(world, "grid"):
+        cells = list(world.grid)
+        picks = [cells[i] for i in rng.randint(len(cells), size=calls)]
+    else:
+        picks = rng.randint(world.num_cells, size=calls).tolist()
+    get_neighbors = world.get_neighbors
+    #The first call builds the neighbor table if the ocean has none yet
+    #(the partitioned engine's strips use their own), so it is untimed.
+    get_neighbors(picks[0])
+    start = time.perf_counter()
+    for cell in picks:
+        get_neighbors(cell)
+    return (time.perf_counter() - start) * 1e9 / calls
+
+
+def allocation_peak(world, ticks=2):
+    """
+    Return the largest amount of memory, in bytes, allocated above the
+    starting point during any of a few ticks, as traced by tracemalloc
+    (which numpy reports its buffers to). Python keeps no count of
+    allocations, so this high-water mark is what is reported instead.
+    """
+    tracemalloc.start()
+    peak = 0
+    try:
+        for _ in range(ticks):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            world.update()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def make_display_world(params, spec):
+    """Return a WatorWorld or ArrayWorld (and the pygame module) for params."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame as pg
+    from .states.gameplay import WORLD_ENGINES
+    params = dict(params, **{
+            "topleft": (0, 0),
+            "cell size": 1,
+            "render mode": spec["render mode"]})
+    params["size"] = params["columns"], params["rows"]
+    return WORLD_ENGINES[params["engine"]](params), pg
+
+
+def time_draw(world, pg, ticks=5):
+    """Return the mean ms per draw, drawing after each of a few ticks."""
+    surface = pg.Surface(world.world_rect.size)
+    world.draw(surface)
+    total = 0.0
+    for _ in range(ticks):
+        world.update()
+        start = time.perf_counter()
+        world.draw(surface)
+        total += time.perf_counter() - start
+    return total * 1000 / ticks
+
+
+def time_report(world, calls=10000):
+    """Return the mean ns per Gameplay.report call."""
+    from .states.gameplay import Gameplay
+    from .components.history import History
+    state = Gameplay.__new__(Gameplay)
+    state.world = world
+    state.history = History(("fish", "shark"), 2000)
+    start = time.perf_counter()
+    for _ in range(calls):
+        state.report(world.num_fish, world.num_sharks)
+    return (time.perf_counter() - start) * 1e9 / calls
+
+
+def run_case(job):
+    """Benchmark a single case in a worker process."""
+    case, spec, draw = job
+    params = case_params(case, spec)
+    result = dict(case)
+    start = time.perf_counter()
+    if draw:
+        world, pg = make_display_world(params, spec)
+    else:
+        world = headless.ENGINES[params["engine"]](params)
+    result["build seconds"] = time.perf_counter() - start
+    ticks, seconds = time_ticks(world, spec)
+    cells = case["columns"] * case["rows"]
+    result.update({
+            "ticks": ticks,
+            "seconds": seconds,
+            "ticks per second": ticks / seconds,
+            "ns per cell": seconds * 1e9 / (ticks * cells),
+            "alloc peak bytes per tick": allocation_peak(world)})
+    if draw:
+        result["draw ms"] = time_draw(world, pg)
+        result["report ns"] = time_report(world)
+    #Read before timing get_neighbors, which may build a table the
+    #update never uses.
+    result["peak rss kb"] = peak_rss_kb()
+    result["get_neighbors ns"] = time_neighbors(world, np.random.RandomState(0))
+    if hasattr(world, "close"):
+        world.close()
+    return result
+
+
+def case_process(job, conn):
+    conn.send(run_case(job))
+    conn.close()
+
+
+def run_in_process(job):
+    """
+    Run a case in a fresh process and return its result. The process is
+    not a daemon (as pool workers are), so a partitioned case can start
+    workers of its own. A case whose process dies without a result
+    (crashed or killed, e.g. out of memory) is returned marked "failed"
+    with the process's "exit code".
+    """
+    receiver, sender = multiprocessing.Pipe(False)
+    process = multiprocessing.Process(target=case_process, args=(job, sender))
+    process.start()
+    sender.close()
+    try:
+        return receiver.recv()
+    except EOFError:
+        process.join()
+        return dict(job[0], **{"failed": True, "exit code": process.exitcode})
+    finally:
+        process.join()
+
+
+def machine_info():
+    return {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu count": multiprocessing.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def benchmark(spec, draw=False, log=None):
+    """
+    Run every case in spec, each in its own process, and return the
+    report dict. Each finished case is summarized on log if given.
+    """
+    results = []
+    for case in make_cases(spec):
+        result = run_in_process((case, spec, draw))
+        results.append(result)
+        if log is not None and result.get("failed"):
+            log.write("{backend} {columns}x{rows} {fish density}/{shark density} "
+                          "{param set}: failed, exit code {exit code}\n".format(**result))
+            log.flush()
+        elif log is not None:
+            log.write("{backend} {columns}x{rows} {fish density}/{shark density} "
+                          "{param set}: {ticks per second:.2f} ticks/s, "
+                          "{ns per cell:.1f} ns/cell\n".format(**result))
+            log.flush()
+    return {"machine": machine_info(), "spec": spec, "draw": draw,
+               "results": results}
+
+
+def compare(old, new, threshold=0.1):
+    """
+    Return a list of (key, old ticks/s, new ticks/s, ratio) for the cases
+    in both reports whose speed changed by more than threshold. Failed
+    cases are left out.
+    """
+    before = {case_key(r): r for r in old["results"] if not r.get("failed")}
+    changes = []
+    for result in new["results"]:
+        key = case_key(result)
+        if key not in before or result.get("failed"):
+            continue
+        old_speed = before[key]["ticks per second"]
+        new_speed = result["ticks per second"]
+        ratio = new_speed / old_speed
+        if abs(ratio - 1) > threshold:
+            changes.append((key, old_speed, new_speed, ratio))
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            description="Benchmark the Wa-Tor simulation and write the "
+                             "results as JSON.")
+    parser.add_argument("-s", "--spec",
+                                  help="JSON file overriding parts of the default matrix")
+    parser.add_argument("-o", "--output", default="benchmark.json",
+                                  help="JSON results file (default benchmark.json)")
+    parser.add_argument("--backend", action="append",
+                                  help="only run this backend (repeatable)")
+    parser.add_argument("--size", action="append",
+                                  help="only run this COLUMNSxROWS size (repeatable)")
+    parser.add_argument("--draw", action="store_true",
+                                  help="benchmark the display worlds, including draw "
+                                         "and Gameplay.report")
+    parser.add_argument("--compare",
+                                  help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                                  help="relative speed change to report when "
+                                         "comparing (default 0.1)")
+    args = parser.parse_args(argv)
+    spec = dict(DEFAULT_SPEC)
+    if args.spec:
+        with open(args.spec) as f:
+            spec.update(json.load(f))
+    if args.backend:
+        spec["backends"] = args.backend
+    if args.size:
+        spec["sizes"] = args.size
+    report = benchmark(spec, args.draw, sys.stderr)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        changes = compare(old, report, args.threshold)
+        for key, old_speed, new_speed, ratio in changes:
+            print("{}: {:.2f} -> {:.2f} ticks/s ({:+.0%})".format(
+                    key, old_speed, new_speed, ratio - 1))
+        if any(ratio < 1 for key, old_speed, new_speed, ratio in changes):
+            return 1
+    return 0
@@ -0,0 +1,475 @@
+"""
+NumPy array-backed Wa-Tor simulation without any display code. Like
+ocean.Ocean, nothing here imports pygame or loads assets; ArrayWorld
+adds drawing on top of ArrayOcean.
+"""
+
+import numpy as np
+
+from .neighbors import OFFSETS, NUM_COLORS, chromatic_colors, make_neighbor_table
+from .ocean import grid_dimensions, make_rng, WATER, FISH, SHARK
+from .seeding import place_creatures
+
+
+#Lookup tables for 4-bit neighbor masks: the number of set bits in each
+#mask and, for each mask, the column of its first, second... set bit.
+BIT_COUNTS = np.array([bin(m).count("1") for m in range(16)], dtype=np.uint8)
+BIT_CHOICES = np.zeros((16, 4), dtype=np.intp)
+for _mask in range(16):
+    _columns = [j for j in range(4) if _mask & (1 << j)]
+    BIT_CHOICES[_mask, :len(_columns)] = _columns
+
+
+def neighbor_lists(species, table, index):
+    """
+    Return lists of the flat indexes of the vacant and fish-occupied cells
+    next to the cell at flat index, given memoryviews of the flat species
+    array and neighbor table (see ArrayOcean.cell_views).
+    """
+    vacant = []
+    fishes = []
+    start = 4 * index
+    for n in table[start:start + 4]:
+        occupant = species[n]
+        if occupant == WATER:
+            vacant.append(n)
+        elif occupant == FISH:
+            fishes.append(n)
+    return vacant, fishes
+
+
+class ArrayOcean(object):
+    """
+    An Ocean backed by dense NumPy arrays instead of a dict of lists.
+    The ocean is stored as three (num_columns, num_rows) arrays indexed
+    by [x, y]: species (WATER, FISH or SHARK), age and starve (ticks a
+    shark has left before it starves). Flat indexes run x-major so a scan
+    over range(num_cells) visits cells in the same order as iterating
+    Ocean.grid.
+
+    "update mode" takes the modes of Ocean and "vectorized". "scan",
+    "sparse" and "random" step cell by cell exactly as Ocean does.
+    "vectorized" is a synchronous update; "chromatic" runs it once per
+    color, so it visits colors as Ocean does but draws different values.
+    """
+    offsets = OFFSETS
+    update_modes = ("scan", "sparse", "random", "chromatic", "vectorized")
+    def __init__(self, setup_dict):
+        d = setup_dict
+        self.num_columns, self.num_rows = grid_dimensions(d)
+        self.num_cells = self.num_columns * self.num_rows
+        self.fish_reproduce_age = d["fish reproduce age"]
+        self.shark_reproduce_age = d["shark reproduce age"]
+        self.shark_starve_time = d["shark starve time"]
+        self.update_mode = d["update mode"]
+        if self.update_mode not in self.update_modes:
+            raise ValueError("Unknown update mode: {}".format(self.update_mode))
+        self.seed, self.rng = make_rng(d["seed"])
+        self.table_dims = None
+        self.neighbor_table = None
+        self.colors = None
+        self.generate_world(setup_dict)
+        self.ticks = 0
+
+    def allocate(self, dtype):
+        """Return a zeroed (num_columns, num_rows) array for the ocean."""
+        return np.zeros((self.num_columns, self.num_rows), dtype=dtype)
+
+    def generate_world(self, setup_dict):
+        self.occupied = None
+        if setup_dict["placement"] is None:
+            #The arrays come from set_state (see snapshot.load).
+            self.species = self.age = self.starve = None
+            self.reset_counters(0, 0)
+            return
+        self.species = self.allocate(np.uint8)
+        self.age = self.allocate(np.int32)
+        self.starve = self.allocate(np.int32)
+        fish, sharks = place_creatures(setup_dict, self.num_columns,
+                                                     self.num_rows, self.rng)
+        species = self.species.reshape(-1)
+        species[fish] = FISH
+        species[sharks] = SHARK
+        self.starve.reshape(-1)[sharks] = self.shark_starve_time
+        self.reset_counters(len(fish), len(sharks))
+
+    def get_state(self):
+        """
+        Return the ocean arrays in a dict keyed "species", "age" and
+        "starve". The arrays are the live ones, not copies.
+        """
+        return {"species": self.species, "age": self.age, "starve": self.starve}
+
+    def set_state(self, arrays, counters=None):
+        """
+        Use the arrays from a get_state dict as the ocean. They are used
+        as they are, so memory-mapped arrays stay memory-mapped. counters
+        is a dict of counter values to restore (see reset_counters); if
+        it is None the populations are recounted and the totals zeroed.
+        """
+        self.species = arrays["species"]
+        self.age = arrays["age"]
+        self.starve = arrays["starve"]
+        self.occupied = None
+        if counters is None:
+            self.reset_counters(int(np.count_nonzero(self.species == FISH)),
+                                       int(np.count_nonzero(self.species == SHARK)))
+        else:
+            self.__dict__.update(counters)
+
+    def reset_counters(self, num_fish, num_sharks):
+        """
+        Set the live population counts and zero the running totals of
+        births, deaths (starved sharks and eaten fish) and predations
+        (fish eaten). The counters are kept up to date as creatures are
+        born, eaten, starve or get added, so reading them is O(1).
+        """
+        self.num_fish = num_fish
+        self.num_sharks = num_sharks
+        self.births = 0
+        self.deaths = 0
+        self.predations = 0
+
+    def build_neighbor_table(self):
+        """
+        Build the (cells, 4) neighbor lookup table and the claims array
+        of pick_moves unless they already match the grid dimensions. They
+        are built on the first update (or get_neighbors call), not with
+        the ocean, so loading a snapshot doesn't pay for them up front.
+        """
+        dims = self.num_columns, self.num_rows
+        if dims == self.table_dims:
+            return
+        self.table_dims = dims
+        self.neighbor_table = make_neighbor_table(*dims)
+        self.claims = np.full(self.num_cells, -1, dtype=np.int32)
+
+    def cell_views(self):
+        """
+        Return memoryviews of the flat species, age and starve arrays and
+        of the flattened neighbor table for the cell by cell updates.
+        Indexing a memoryview reads or writes a plain int, far quicker
+        than indexing an array one element at a time.
+        """
+        if self.neighbor_table is None:
+            self.build_neighbor_table()
+        return (memoryview(self.species.reshape(-1)),
+                   memoryview(self.age.reshape(-1)),
+                   memoryview(self.starve.reshape(-1)),
+                   memoryview(self.neighbor_table.reshape(-1)))
+
+    def get_neighbors(self, index):
+        """
+        Return lists of the flat indexes of the vacant and fish-occupied
+        cells next to the cell at flat index.
+        """
+        species, _, _, table = self.cell_views()
+        return neighbor_lists(species, table, index)
+
+    def occupied_cells(self):
+        """
+        Return the set of flat indexes of the cells that hold a creature.
+        In "sparse" and "random" modes the set is kept up to date as
+        creatures move, are born and die, so a tick costs time in
+        proportion to the population; in the other modes it is built
+        from species on every call.
+        """
+        if self.occupied is not None:
+            return self.occupied
+        occupied = set(np.flatnonzero(self.species).tolist())
+        if self.update_mode in ("sparse", "random"):
+            self.occupied = occupied
+        return occupied
+
+    def update(self):
+        """Advance the world one tick using the current update mode."""
+        self.build_neighbor_table()
+        self.ticks += 1
+        if self.update_mode == "vectorized":
+            self.vector_update()
+        elif self.update_mode == "chromatic":
+            self.chromatic_update()
+        elif self.update_mode == "scan":
+            self.scan_update()
+        else:
+            self.sequential_update()
+
+    def scan_update(self):
+        """
+        Scan every cell in x-major order with the same rules (and scan
+        order) as Ocean.scan_update.
+        """
+        rolls = self.rng.random_sample(self.num_cells).tolist()
+        self.step_cells(range(self.num_cells), rolls)
+
+    def sequential_update(self):
+        """
+        Step the occupied cells one at a time in the order of the update
+        mode ("sparse" or "random"), drawing the same values as
+        Ocean.step_creatures.
+        """
+        cells = sorted(self.occupied_cells())
+        if self.update_mode == "random":
+            cells = [cells[i] for i in self.rng.permutation(len(cells)).tolist()]
+        rolls = self.rng.random_sample(len(cells)).tolist()
+        self.step_cells(cells, rolls, set())
+
+    def chromatic_update(self):
+        """
+        Run the vectorized update once for each color of the chromatic
+        coloring, in a random order of the colors, with only the creatures
+        of that color acting. A creature that moved into a cell of a later
+        color has already acted, so it is left out of that color's turn.
+        """
+        if self.colors is None or self.colors.shape != self.species.shape:
+            self.colors = chromatic_colors(self.num_columns, self.num_rows)
+        waiting = np.ones(self.species.shape, dtype=bool)
+        for color in self.rng.permutation(NUM_COLORS).tolist():
+            before = self.species.copy()
+            self.vector_update(waiting & (self.colors == color))
+            waiting &= self.species == before
+
+    def step_cells(self, cells, rolls, arrived=None):
+        """
+        Step the creatures in cells in order, each moving with the matching
+        value of rolls. If arrived is a set, the cells creatures move into
+        are added to it and skipped when they come up in cells. A creature
+        old enough to reproduce leaves a newborn behind when it moves.
+        """
+        species, age, starve, table = self.cell_views()
+        occupied = self.occupied
+        fish_age = self.fish_reproduce_age
+        shark_age = self.shark_reproduce_age
+        starve_time = self.shark_starve_time
+        fish_born = sharks_born = eaten = starved = 0
+        #Everything is inlined (neighbor_lists too): this loop is the
+        #whole tick in the cell by cell modes.
+        for cell, roll in zip(cells, rolls):
+            occupant = species[cell]
+            if occupant == WATER:
+                continue
+            if arrived is not None and cell in arrived:
+                continue
+            vacant = []
+            fishes = []
+            start = 4 * cell
+            for n in table[start:start + 4]:
+                kind = species[n]
+                if kind == WATER:
+                    vacant.append(n)
+                elif kind == FISH:
+                    fishes.append(n)
+            cell_age = age[cell] + 1
+            if occupant == FISH:
+                if not vacant:
+                    age[cell] = cell_age
+                    continue
+                dest = vacant[int(roll * len(vacant))]
+                breeds = cell_age >= fish_age
+                fish_born += breeds
+            else:
+                cell_starve = starve[cell] - 1
+                if cell_starve <= 0:
+                    species[cell] = WATER
+                    age[cell] = 0
+                    starve[cell] = 0
+                    if occupied is not None:
+                        occupied.discard(cell)
+                    starved += 1
+                    continue
+                if fishes:
+                    dest = fishes[int(roll * len(fishes))]
+                    cell_starve = starve_time
+                    eaten += 1
+                elif vacant:
+                    dest = vacant[int(roll * len(vacant))]
+                else:
+                    age[cell] = cell_age
+                    starve[cell] = cell_starve
+                    continue
+                breeds = cell_age >= shark_age
+                sharks_born += breeds
+                starve[dest] = cell_starve
+            species[dest] = occupant
+            if breeds:
+                age[dest] = 0
+                age[cell] = 0
+                starve[cell] = starve_time if occupant == SHARK else 0
+            else:
+                age[dest] = cell_age
+                species[cell] = WATER
+                age[cell] = 0
+                starve[cell] = 0
+            if occupied is not None:
+                occupied.add(dest)
+                if not breeds:
+                    occupied.discard(cell)
+            if arrived is not None:
+                arrived.add(dest)
+        self.num_fish += fish_born - eaten
+        self.num_sharks += sharks_born - starved
+        self.births += fish_born + sharks_born
+        self.deaths += eaten + starved
+        self.predations += eaten
+
+    def vector_update(self, active=None):
+        """
+        Update the whole ocean with array operations. Sharks act first,
+        then fish, and each phase is synchronous: every creature picks its
+        target from the state at the start of the phase. If active is
+        given (a bool array shaped like species) only the creatures in
+        cells where it is True act; the rest can still be eaten or moved
+        next to, but stay put.
+
+        Conflicts are resolved by random priority. Each mover is given a
+        random priority and, when several movers pick the same
+        target cell, only the one with the highest priority moves; the
+        others stay where they are for this tick (losing sharks do not eat).
+
+        The cost is linear in the number of cells, about 100 ns per cell
+        with 30% fish, mostly in gathering neighbors by index.
+        """
+        species = self.species.reshape(-1)
+        age = self.age.reshape(-1)
+        starve = self.starve.reshape(-1)
+
+        if active is not None:
+            active = active.reshape(-1)
+        sharks = self.actors(SHARK, active)
+        age[sharks] += 1
+        starve[sharks] -= 1
+        starved = starve[sharks] <= 0
+        dead = sharks[starved]
+        species[dead] = WATER
+        age[dead] = 0
+        starve[dead] = 0
+        self.num_sharks -= len(dead)
+        self.deaths += len(dead)
+        sharks = sharks[~starved]
+        neighbors = self.neighbor_table[sharks]
+        prey = self.neighbor_mask(neighbors, FISH)
+        vacant = self.neighbor_mask(neighbors, WATER)
+        candidates = np.where(prey > 0, prey, vacant)
+        src, dest = self.pick_moves(sharks, neighbors, candidates)
+        fed = species[dest] == FISH
+        starve[src[fed]] = self.shark_starve_time
+        eaten = int(np.count_nonzero(fed))
+        self.num_fish -= eaten
+        self.deaths += eaten
+        self.predations += eaten
+        newborns = self.move_all(src, dest, self.shark_reproduce_age)
+        self.num_sharks += newborns
+        self.births += newborns
+
+        fishes = self.actors(FISH, active)
+        age[fishes] += 1
+        neighbors = self.neighbor_table[fishes]
+        candidates = self.neighbor_mask(neighbors, WATER)
+        src, dest = self.pick_moves(fishes, neighbors, candidates)
+        newborns = self.move_all(src, dest, self.fish_reproduce_age)
+        self.num_fish += newborns
+        self.births += newborns
+
+    def actors(self, kind, active=None):
+        """Return the flat indexes of the creatures of kind that act."""
+        found = self.species.reshape(-1) == kind
+        if active is not None:
+            found &= active
+        return np.flatnonzero(found)
+
+    def neighbor_mask(self, neighbors, kind):
+        """
+        Return a 4-bit mask per row of neighbors with bit j set when
+        neighbor j holds kind.
+        """
+        species = self.species.reshape(-1)
+        mask = np.zeros(len(neighbors), dtype=np.uint8)
+        for j in range(4):
+            mask |= (species[neighbors[:, j]] == kind).view(np.uint8) << j
+        return mask
+
+    def pick_moves(self, cells, neighbors, candidates):
+        """
+        Choose a random neighbor from each cell's candidates bit mask and
+        resolve conflicting choices. Returns the source and destination
+        indexes of the moves that won.
+        """
+        counts = BIT_COUNTS[candidates]
+        movable = np.flatnonzero(counts)
+        cells = cells[movable]
+        candidates = candidates[movable]
+        #One uniform value per mover picks its candidate with its whole
+        #part and gives its priority with the (still uniform) remainder.
+        rolls = self.rng.random_sample(len(cells)) * counts[movable]
+        choice = rolls.astype(np.intp)
+        column = BIT_CHOICES[candidates, choice]
+        dest = neighbors[movable, column]
+        rolls -= choice
+        rolls *= 1 << 29
+        #The contenders for a cell all come from different directions, so
+        #appending the column to a random number makes priorities unique.
+        priority = rolls.astype(np.int32)
+        priority <<= 2
+        priority |= column
+        claims = self.claims
+        np.maximum.at(claims, dest, priority)
+        winners = claims[dest] == priority
+        claims[dest] = -1
+        return cells[winners], dest[winners]
+
+    def move_all(self, src, dest, reproduce_age):
+        """
+        Move every creature in src to the matching cell in dest, leaving
+        a newborn behind where it is old enough to reproduce, as
+        step_cells does one at a time. Sources and destinations must not
+        overlap. The caller does the counting; the number of newborns
+        left behind is returned.
+        """
+        species = self.species.reshape(-1)
+        age = self.age.reshape(-1)
+        starve = self.starve.reshape(-1)
+        species[dest] = species[src]
+        age[dest] = age[src]
+        starve[dest] = starve[src]
+        breeding = age[dest] >= reproduce_age
+        age[dest[breeding]] = 0
+        parents = src[breeding]
+        age[parents] = 0
+        starve[parents[species[parents] == SHARK]] = self.shark_starve_time
+        left = src[~breeding]
+        species[left] = WATER
+        age[left] = 0
+        starve[left] = 0
+        return len(parents)
+
+    def add_fish(self):
+        x, y = self.random_cell()
+        self.remove_occupant(x, y)
+        self.species[x, y] = FISH
+        self.num_fish += 1
+        if self.occupied is not None:
+            self.occupied.add(x * self.num_rows + y)
+
+    def add_shark(self):
+        x, y = self.random_cell()
+        self.remove_occupant(x, y)
+        self.species[x, y] = SHARK
+        self.starve[x, y] = self.shark_starve_time
+        self.num_sharks += 1
+        if self.occupied is not None:
+            self.occupied.add(x * self.num_rows + y)
+
+    def random_cell(self):
+        return (int(self.rng.randint(self.num_columns)),
+                   int(self.rng.randint(self.num_rows)))
+
+    def remove_occupant(self, x, y):
+        """Empty the cell at (x, y), keeping the population counts in step."""
+        occupant = self.species[x, y]
+        if occupant == FISH:
+            self.num_fish -= 1
+        elif occupant == SHARK:
+            self.num_sharks -= 1
+        self.species[x, y] = WATER
+        self.age[x, y] = 0
+        self.starve[x, y] = 0
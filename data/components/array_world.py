@@ -0,0 +1,209 @@
+import numpy as np
+import pygame as pg
+
+from .. import prepare
+from .array_ocean import ArrayOcean, WATER, FISH, SHARK
+from .partitioned_ocean import PartitionedOcean
+from .sprites import SPRITES
+from .viewport import Viewport
+
+
+def copy_transposed(src, dest, block=64):
+    """
+    Copy the transpose of src into dest. Going a band of columns at a
+    time keeps reads and writes cache friendly, which is several times
+    faster than a plain transposed assignment for large arrays.
+    """
+    for i in range(0, src.shape[0], block):
+        dest[:, i:i + block] = src[i:i + block].T
+
+
+class ArrayWorld(ArrayOcean):
+    """
+    An ArrayOcean that can draw itself. Besides the "full" and "dirty"
+    render modes it shares with WatorWorld, it has a "pixels" mode for
+    large oceans that colors cells straight from the species array.
+    Only the cells in the window of its viewport are drawn.
+    """
+    shark_color = prepare.SHARK_COLOR
+    fish_color = prepare.FISH_COLOR
+    water_color = prepare.WATER_COLOR
+    def __init__(self, setup_dict):
+        d = setup_dict
+        self.left, self.top = d["topleft"]
+        self.cell_size = d["cell size"]
+        self.fish_img = prepare.GFX["fish1"]
+        self.shark_img = prepare.GFX["shark1"]
+        self.render_mode = d["render mode"]
+        super(ArrayWorld, self).__init__(setup_dict)
+        self.width = min(d["size"][0], self.num_columns * self.cell_size)
+        self.height = min(d["size"][1], self.num_rows * self.cell_size)
+        self.viewport = Viewport(((self.left, self.top), (self.width, self.height)),
+                                             self.num_columns, self.num_rows, self.cell_size)
+        self.world_rect = self.viewport.rect
+        self.canvas = None
+        self.frame = None
+        self.pixels = None
+        self.scaled = None
+
+    def draw(self, surface):
+        """
+        Draw the world using the current render mode. Returns a list of
+        the screen rects that changed, or None if the whole world may
+        have changed.
+        """
+        window, species = self.frame_window()
+        if self.render_mode == "dirty":
+            return self.draw_dirty(surface, window, species)
+        elif self.render_mode == "pixels":
+            return self.draw_pixels(surface, window, species)
+        self.draw_full(surface, window, species)
+
+    def creature_images(self, cell_size):
+        """
+        Return a dict of the tile to draw FISH and SHARK with at
+        cell_size, or of None where cells are too small for images.
+        """
+        water = self.water_color
+        return {FISH: SPRITES.get(self.fish_img, cell_size, water),
+                   SHARK: SPRITES.get(self.shark_img, cell_size, water)}
+
+    def capture_frame(self):
+        """
+        Return the viewport's window and a copy of the species of its
+        cells. While frame holds one, draw shows it instead of the live
+        array.
+        """
+        window = self.viewport.window
+        species = self.window_species(window)
+        if species is self.species:
+            species = species.copy()
+        return window, species
+
+    def window_species(self, window):
+        """
+        Return the species of window's cells: the species array itself if
+        the window is the whole world, else a copy.
+        """
+        if self.viewport.whole_world(window):
+            return self.species
+        columns, rows = self.viewport.window_indexes(window)
+        return self.species[np.ix_(columns, rows)]
+
+    def frame_window(self):
+        """
+        Return the window and species to draw. Those of frame are used
+        even after the viewport has moved, so every drawn frame shows a
+        whole tick; the new window is drawn once the sim thread captures
+        it. Without a frame the live array is read.
+        """
+        if self.frame is not None:
+            return self.frame
+        window = self.viewport.window
+        return window, self.window_species(window)
+
+    def make_palette_surface(self, size):
+        surf = pg.Surface(size, 0, 8)
+        surf.set_palette([self.water_color, self.fish_color, self.shark_color])
+        return surf
+
+    def blit_window(self, surface, image, window):
+        """Blit an image of window's cells, cut to the viewport's rect."""
+        area = self.world_rect.move(-window.left, -window.top)
+        surface.blit(image, self.world_rect, area)
+
+    def pixel_image(self, species, window):
+        """
+        Return an image of species, the species of window's cells, made by
+        copying it into an 8-bit surface with one pixel per cell, whose
+        palette maps WATER, FISH and SHARK to their colors, and scaling
+        that up to the cell size.
+        """
+        size = species.shape
+        if self.pixels is None or self.pixels.get_size() != size:
+            self.pixels = self.make_palette_surface(size)
+        #pixels2d indexes the surface [x, y] but its memory is row-major,
+        #so write through its transpose. The view locks the surface and
+        #has to be released before blitting.
+        view = pg.surfarray.pixels2d(self.pixels)
+        copy_transposed(species, view.T)
+        del view
+        if window.cell_size == 1:
+            return self.pixels
+        size = size[0] * window.cell_size, size[1] * window.cell_size
+        if self.scaled is None or self.scaled.get_size() != size:
+            self.scaled = self.make_palette_surface(size)
+        pg.transform.scale(self.pixels, size, self.scaled)
+        return self.scaled
+
+    def draw_pixels(self, surface, window, species):
+        """
+        Draw the window's cells as squares of color. The cost depends on
+        the size of the window, not on how many creatures are in it.
+        """
+        image = self.pixel_image(species, window)
+        self.blit_window(surface, image, window)
+        return [self.world_rect.copy()]
+
+    def draw_dirty(self, surface, window, species):
+        """
+        Redraw only the cells whose species changed since the last frame
+        onto a persistent canvas of the window, then blit the canvas to
+        surface. Moving the viewport redraws the whole canvas.
+        """
+        left, top, size = window.left, window.top, window.cell_size
+        images = self.creature_images(size)
+        colors = {WATER: self.water_color, FISH: self.fish_color,
+                      SHARK: self.shark_color}
+        redraw_all = (self.canvas is None or images != self.canvas_images or
+                            window != self.canvas_window)
+        if redraw_all:
+            canvas_size = window.num_columns * size, window.num_rows * size
+            if self.canvas is None or self.canvas.get_size() != canvas_size:
+                self.canvas = pg.Surface(canvas_size).convert()
+            self.canvas_images = images
+            self.canvas_window = window
+            if images[FISH] is None:
+                #Flat squares of color are quicker to draw all at once.
+                self.canvas.blit(self.pixel_image(species, window), (0, 0))
+                self.drawn = species.copy()
+            else:
+                self.canvas.fill(self.water_color)
+                self.drawn = np.zeros_like(species)
+        changed = np.flatnonzero(species != self.drawn)
+        xs, ys = np.divmod(changed, window.num_rows)
+        kinds = species.reshape(-1)[changed]
+        self.drawn.reshape(-1)[changed] = kinds
+        rects = []
+        for x, y, kind in zip(xs.tolist(), ys.tolist(), kinds.tolist()):
+            rect = pg.Rect(x * size, y * size, size, size)
+            if kind == WATER or images[kind] is None:
+                self.canvas.fill(colors[kind], rect)
+            else:
+                self.canvas.blit(images[kind], rect)
+            rects.append(rect.move(left, top))
+        self.blit_window(surface, self.canvas, window)
+        if redraw_all or len(rects) > species.size // 4:
+            return [self.world_rect.copy()]
+        return rects
+
+    def draw_full(self, surface, window, species):
+        images = self.creature_images(window.cell_size)
+        if images[FISH] is None:
+            #Cells too small for images are flat squares of color, which
+            #is what the pixels mode draws.
+            self.draw_pixels(surface, window, species)
+            return
+        surface.fill(self.water_color, self.world_rect)
+        clip = surface.get_clip()
+        surface.set_clip(self.world_rect)
+        left, top, size = window.left, window.top, window.cell_size
+        for kind, img in images.items():
+            xs, ys = np.nonzero(species == kind)
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                surface.blit(img, (left + x * size, top + y * size))
+        surface.set_clip(clip)
+
+
+class PartitionedWorld(PartitionedOcean, ArrayWorld):
+    """A PartitionedOcean that draws itself like an ArrayWorld."""
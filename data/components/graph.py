@@ -14,27 +14,26 @@ class Graph(object):
         self.rect = pg.Rect(topleft, size)
 
     def make_lines(self, data_lines):
+        """
+        Rebuild the line points. data_lines is a list of [color, series]
+        pairs where each series is a history.RingBuffer or Decimator.
+        Only call this when the series have changed.
+        """
         points = []
         low = 0
-        high = 0
-        x_scale = self.width / float(len(data_lines[0][1]))
-        for d in data_lines:
-            color = d[0]
-            vals = d[1]
-            for v in vals:
-                if v > high:
-                    high = v
-        y_scale = float(self.height) / (high - low)   
-        for color, vals_ in data_lines:
+        high = max(series.max for color, series in data_lines)
+        num = max(len(data_lines[0][1]), 1)
+        x_scale = self.width / float(num)
+        y_scale = float(self.height) / max(high - low, 1)
+        for color, series in data_lines:
             scaled = [(self.left + (int(i * x_scale)), self.bottom - int(v * y_scale))
-                          for i, v in enumerate(vals_)]
+                          for i, v in enumerate(series.values())]
             if len(scaled) < 2:
                 scaled.append(scaled[0])
             points.append([color, scaled])
         self.points = points
         self.high_label.set_text("{}".format(high))
         self.low_label.set_text("{}".format(low))
-        
 
     def draw(self, surface):
         pg.draw.rect(surface, self.bg_color, self.rect)
@@ -0,0 +1,161 @@
+"""
+Fixed-size population histories for the Gameplay graph. Appending is O(1)
+(amortized) and memory stays constant however long the simulation runs.
+"""
+
+from array import array
+from collections import deque
+
+
+class RingBuffer(object):
+    """
+    A fixed-capacity buffer of ints backed by an array.array. Once full,
+    each append overwrites the oldest value. The largest value currently
+    in the buffer is tracked with a monotonic queue, so reading max is
+    O(1) and appending is amortized O(1).
+    """
+    def __init__(self, capacity, typecode="l"):
+        self.capacity = capacity
+        self.data = array(typecode, [0] * capacity)
+        self.start = 0
+        self.size = 0
+        self.appended = 0
+        self.peaks = deque()
+
+    def __len__(self):
+        return self.size
+
+    def append(self, value):
+        end = (self.start + self.size) % self.capacity
+        self.data[end] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+        seq = self.appended
+        self.appended += 1
+        peaks = self.peaks
+        while peaks and peaks[-1][1] <= value:
+            peaks.pop()
+        peaks.append((seq, value))
+        if peaks[0][0] <= seq - self.capacity:
+            peaks.popleft()
+
+    @property
+    def max(self):
+        return self.peaks[0][1] if self.peaks else 0
+
+    def values(self):
+        """Return the buffered values, oldest first."""
+        end = self.start + self.size
+        if end <= self.capacity:
+            return self.data[self.start:end].tolist()
+        return (self.data[self.start:].tolist() +
+                   self.data[:end - self.capacity].tolist())
+
+
+def join(first, second):
+    """
+    Return the extremes of two consecutive stretches of a series, each
+    given as (low, high, rising) where rising is True if the low came
+    before the high.
+    """
+    low_first = first[0] <= second[0]
+    high_first = first[1] >= second[1]
+    low = first[0] if low_first else second[0]
+    high = first[1] if high_first else second[1]
+    if low_first == high_first:
+        rising = first[2] if low_first else second[2]
+    else:
+        rising = low_first
+    return low, high, rising
+
+
+class Decimator(object):
+    """
+    Summarizes an unbounded series in at most capacity buckets, each
+    holding the smallest and largest values of span consecutive appends,
+    so both the peaks and the troughs of the series are kept. When the
+    buckets fill up, neighboring pairs are merged and span doubles, so
+    the whole history always fits in a fixed amount of memory.
+    """
+    def __init__(self, capacity, typecode="l"):
+        self.capacity = capacity - capacity % 2
+        self.typecode = typecode
+        self.lows = array(typecode)
+        self.highs = array(typecode)
+        self.rising = array("b")
+        self.span = 1
+        self.pending = None
+        self.pending_count = 0
+        self.max = 0
+
+    def __len__(self):
+        """Return the number of values, two per bucket."""
+        return 2 * (len(self.lows) + (1 if self.pending_count else 0))
+
+    def append(self, value):
+        if value > self.max:
+            self.max = value
+        if self.pending_count == 0:
+            self.pending = value, value, True
+        else:
+            self.pending = join(self.pending, (value, value, True))
+        self.pending_count += 1
+        if self.pending_count == self.span:
+            low, high, rising = self.pending
+            self.lows.append(low)
+            self.highs.append(high)
+            self.rising.append(rising)
+            self.pending_count = 0
+            if len(self.lows) == self.capacity:
+                self.merge()
+
+    def merge(self):
+        """Halve the number of buckets by merging neighboring pairs."""
+        old = list(zip(self.lows, self.highs, self.rising))
+        merged = [join(old[i], old[i + 1]) for i in range(0, len(old), 2)]
+        self.lows = array(self.typecode, [bucket[0] for bucket in merged])
+        self.highs = array(self.typecode, [bucket[1] for bucket in merged])
+        self.rising = array("b", [bucket[2] for bucket in merged])
+        self.span *= 2
+
+    def values(self):
+        """
+        Return the low and high of every bucket, oldest first and each
+        pair in the order they came, including a partial bucket.
+        """
+        buckets = list(zip(self.lows, self.highs, self.rising))
+        if self.pending_count:
+            buckets.append(self.pending)
+        values = []
+        for low, high, rising in buckets:
+            values.extend((low, high) if rising else (high, low))
+        return values
+
+
+class History(object):
+    """
+    Population series keyed by name. Each series is kept at two
+    resolutions: a RingBuffer of the most recent values and a Decimator
+    covering the whole run. version increases with every append so
+    readers can tell when there is new data.
+    """
+    def __init__(self, names, capacity, overview_capacity=1024):
+        self.names = names
+        self.recent = {name: RingBuffer(capacity) for name in names}
+        self.overview = {name: Decimator(overview_capacity) for name in names}
+        self.version = 0
+
+    def append(self, values):
+        """Append a value for every series; values is a dict keyed by name."""
+        for name in self.names:
+            self.recent[name].append(values[name])
+            self.overview[name].append(values[name])
+        self.version += 1
+
+    def series(self, name, whole_run=False):
+        """Return the RingBuffer or, if whole_run, the Decimator for name."""
+        if whole_run:
+            return self.overview[name]
+        return self.recent[name]
@@ -1,9 +1,11 @@
 from itertools import cycle
+import re
 import string
 
 import pygame as pg
 
 from .. import prepare, tools
+from .profiler import PROFILER
 
 
 #To avoid instantiating unnecessary Font objects,
@@ -12,6 +14,14 @@ from .. import prepare, tools
 #font already exists in LOADED_FONTS.
 LOADED_FONTS = {}
 
+#GlyphAtlas objects keyed by (font path, font size, text color, fill color),
+#shared by every GlyphLabel that uses the same combination.
+GLYPH_ATLASES = {}
+
+#The pieces GlyphAtlas cuts text into: pairs of digits and runs of
+#anything else.
+GLYPH_PIECES = re.compile(r"\d\d?|\D+")
+
 #Default values for Button objects - see Button class for specifics
 BUTTON_DEFAULTS = {
         "button_size": (128, 32),
@@ -123,7 +133,8 @@ class Label(pg.sprite.Sprite, tools._KwargMixin):
     def set_text(self, text):
         """Set the text to display."""
         self.text = text
-        self.update_text()
+        with PROFILER.phase("labels"):
+            self.update_text()
 
     def update_text(self):
         """Update the surface using the current properties and text."""
@@ -162,6 +173,91 @@ class Blinker(Label):
             self.set_text(text)
 
 
+class GlyphAtlas(object):
+    """
+    Text pieces of one font rendered in one color (on fill_color if
+    given, else transparent). Text is cut into pairs of digits and runs
+    of other characters ("12345 Fish" is "12", "34", "5", " Fish"), each
+    piece is rendered the first time it's needed and kept, and composing
+    text only blits cached pieces. A counter soon has all the pieces it
+    needs: the hundred digit pairs, ten digits and its fixed words.
+    Blitting costs about the same per piece whatever its length, so
+    pieces longer than a character keep the blits few.
+    """
+    def __init__(self, font, color, fill_color=None):
+        self.font = font
+        self.color = color
+        self.fill_color = fill_color
+        self.height = font.get_height()
+        self.glyphs = {}
+
+    def glyph(self, piece):
+        """Return (surface, width) for a piece of text."""
+        try:
+            return self.glyphs[piece]
+        except KeyError:
+            if self.fill_color:
+                image = self.font.render(piece, True, self.color, self.fill_color)
+            else:
+                image = self.font.render(piece, True, self.color)
+            #Pieces are blitted as plain copies, alpha and all: side by side
+            #they cover the whole text surface, so there is nothing to
+            #blend with and the surface never needs clearing.
+            image.set_alpha(None)
+            self.glyphs[piece] = image, image.get_width()
+            return self.glyphs[piece]
+
+    def compose(self, text, surface=None):
+        """
+        Return a surface with text drawn from glyphs. surface is reused if
+        it is the right size.
+        """
+        glyphs = self.glyphs
+        placed = []
+        x = 0
+        for piece in GLYPH_PIECES.findall(text):
+            image, width = glyphs[piece] if piece in glyphs else self.glyph(piece)
+            placed.append((image, (x, 0)))
+            x += width
+        size = x, self.height
+        if surface is None or surface.get_size() != size:
+            if self.fill_color:
+                surface = pg.Surface(size)
+            else:
+                surface = pg.Surface(size, pg.SRCALPHA)
+        surface.blits(placed, False)
+        return surface
+
+
+class GlyphLabel(Label):
+    """
+    A Label for text that changes often, such as counters. Instead of
+    rendering the whole string with the font, the text is composed from
+    glyphs cached in a GlyphAtlas, and setting the text it already shows
+    does nothing. Takes the same arguments as Label.
+    """
+    def __init__(self, text, rect_attr, *groups, **kwargs):
+        self.text = None
+        self.image = None
+        super(GlyphLabel, self).__init__(text, rect_attr, *groups, **kwargs)
+
+    def set_text(self, text):
+        """Set the text to display unless it is already showing."""
+        if text != self.text:
+            super(GlyphLabel, self).set_text(text)
+
+    def update_text(self):
+        fill = self.fill_color and tuple(self.fill_color)
+        key = self.font_path, self.font_size, tuple(self.text_color), fill
+        if key not in GLYPH_ATLASES:
+            GLYPH_ATLASES[key] = GlyphAtlas(self.font, self.text_color,
+                                                           self.fill_color)
+        self.image = GLYPH_ATLASES[key].compose(self.text, self.image)
+        if self.alpha != 255:
+            self.image.set_alpha(self.alpha)
+        self.rect = self.image.get_rect(**self.rect_attr)
+
+
 class MultiLineLabel(pg.sprite.Sprite):
     """Create a single surface with multiple lines of text rendered on it."""
     def __init__(self, path, size, text, color, rect_attr, bg=None,
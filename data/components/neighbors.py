@@ -0,0 +1,46 @@
+"""
+Neighbor lookup tables for toroidal Wa-Tor grids.
+
+Cells are numbered x-major, so the cell at (x, y) has the flat index
+x * num_rows + y. This is the order WatorWorld.grid is built in and the
+memory order of the (num_columns, num_rows) arrays used by ArrayWorld.
+"""
+
+import numpy as np
+
+
+#Neighbor order used by every table: left, up, right, down.
+OFFSETS = [(-1, 0), (0, -1), (1, 0), (0, 1)]
+
+
+def make_neighbor_table(num_columns, num_rows):
+    """
+    Return an int array of shape (num_columns * num_rows, 4) holding the
+    flat indexes of the four neighbors of each cell, in OFFSETS order,
+    wrapped around the edges of the grid.
+    """
+    num_cells = num_columns * num_rows
+    dtype = np.int32 if num_cells * 4 < 2**31 else np.int64
+    x = np.arange(num_columns, dtype=dtype)[:, None]
+    y = np.arange(num_rows, dtype=dtype)[None, :]
+    table = np.empty((num_columns, num_rows, 4), dtype=dtype)
+    for j, (dx, dy) in enumerate(OFFSETS):
+        table[:, :, j] = ((x + dx) % num_columns) * num_rows + (y + dy) % num_rows
+    return table.reshape(num_cells, 4)
+
+
+#Number of colors in chromatic_colors.
+NUM_COLORS = 5
+
+
+def chromatic_colors(num_columns, num_rows):
+    """
+    Return a (num_columns, num_rows) uint8 array giving each cell the color
+    (x + 2 * y) % NUM_COLORS. Cells within two steps of each other always
+    differ in color, so creatures of one color never share a neighbor or
+    a target cell and can all act at once. Across the wrapped edges that
+    only holds when both dimensions are multiples of NUM_COLORS.
+    """
+    x = np.arange(num_columns)[:, None]
+    y = np.arange(num_rows)[None, :]
+    return ((x + 2 * y) % NUM_COLORS).astype(np.uint8)
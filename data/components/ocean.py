@@ -0,0 +1,344 @@
+"""
+The Wa-Tor simulation without any display code. Nothing in this module
+imports pygame or loads assets, so it can be stepped on machines
+with no display; WatorWorld adds drawing on top of Ocean.
+"""
+
+from random import SystemRandom
+
+import numpy as np
+
+from .neighbors import OFFSETS, NUM_COLORS, make_neighbor_table
+from .seeding import place_creatures
+
+
+#Species codes used by ArrayOcean and by get_state/set_state.
+WATER = 0
+FISH = 1
+SHARK = 2
+
+
+def grid_dimensions(setup_dict):
+    """
+    Return (num_columns, num_rows) for setup_dict, either from explicit
+    "columns" and "rows" values or from the "size" of the world in
+    pixels and its "cell size".
+    """
+    d = setup_dict
+    if "columns" in d:
+        return d["columns"], d["rows"]
+    size = d["size"]
+    return size[0] // d["cell size"], size[1] // d["cell size"]
+
+
+def make_rng(seed=None):
+    """
+    Return (seed, rng) where rng is a NumPy RandomState seeded with
+    seed. If seed is None a fresh one is drawn from the OS, so every run
+    has a seed it can be replayed from.
+    """
+    if seed is None:
+        seed = SystemRandom().randint(0, 2**32 - 1)
+    return seed, np.random.RandomState(seed)
+
+
+class Ocean(object):
+    """
+    The Wa-Tor ocean as a dict mapping (x, y) to None or an occupant list
+    (["fish", age] or ["shark", age, starve]). "update mode" sets the
+    order creatures act in each tick:
+
+    "scan" visits every cell in x-major order; a creature that moves to a
+    cell later in the scan acts again.
+    "sparse" visits the creatures in x-major order.
+    "random" visits the creatures in a new random order every tick.
+    "chromatic" visits the creatures color by color (see
+    neighbors.chromatic_colors) in a new random order of the colors.
+
+    Every mode but "scan" only visits the creatures there were at the
+    start of the tick, each of them once.
+    """
+    offsets = OFFSETS
+    update_modes = ("scan", "sparse", "random", "chromatic")
+    def __init__(self, setup_dict):
+        d = setup_dict
+        self.num_columns, self.num_rows = grid_dimensions(d)
+        self.fish_reproduce_age = d["fish reproduce age"]
+        self.shark_reproduce_age = d["shark reproduce age"]
+        self.shark_starve_time = d["shark starve time"]
+        self.update_mode = d["update mode"]
+        if self.update_mode not in self.update_modes:
+            raise ValueError("Unknown update mode: {}".format(self.update_mode))
+        self.seed, self.rng = make_rng(d["seed"])
+        self.table_dims = None
+        self.generate_world(setup_dict)
+        self.ticks = 0
+
+    def get_neighbors(self, index):
+        vacant = []
+        fishes = []
+        for cell in self.neighbor_cells[index[0] * self.num_rows + index[1]]:
+            occupant = self.grid[cell]
+            if occupant is None:
+                vacant.append(cell)
+            elif occupant[0] == "fish":
+                fishes.append(cell)
+        return vacant, fishes
+
+    def build_neighbor_table(self, indexes):
+        """
+        Build the (cells, 4) neighbor lookup table and the matching tuples
+        of neighboring grid keys. Nothing is rebuilt unless the grid
+        dimensions have changed since the last call.
+        """
+        dims = self.num_columns, self.num_rows
+        if dims == self.table_dims:
+            return
+        self.table_dims = dims
+        self.neighbor_table = make_neighbor_table(*dims)
+        self.neighbor_cells = [tuple(indexes[n] for n in row)
+                                         for row in self.neighbor_table.tolist()]
+
+    def generate_world(self, setup_dict):
+        indexes = [(x, y) for x in range(self.num_columns)
+                        for y in range(self.num_rows)]
+        self.grid = {indx_: None for indx_ in indexes}
+        self.build_neighbor_table(indexes)
+        fish, sharks = place_creatures(setup_dict, self.num_columns,
+                                                     self.num_rows, self.rng)
+        fish_spots = [indexes[i] for i in fish.tolist()]
+        shark_spots = [indexes[i] for i in sharks.tolist()]
+        for f in fish_spots:
+            self.grid[f] = ["fish", 0]
+        for s in shark_spots:
+            self.grid[s] = ["shark", 0, self.shark_starve_time]
+        self.occupied = None
+        self.reset_counters(len(fish_spots), len(shark_spots))
+
+    def get_state(self):
+        """
+        Return the grid as a dict of (num_columns, num_rows) arrays, the
+        same layout ArrayOcean uses: "species" (WATER, FISH or SHARK),
+        "age" and "starve".
+        """
+        shape = self.num_columns, self.num_rows
+        species = np.zeros(shape, dtype=np.uint8)
+        age = np.zeros(shape, dtype=np.int32)
+        starve = np.zeros(shape, dtype=np.int32)
+        flat_species = species.reshape(-1)
+        flat_age = age.reshape(-1)
+        flat_starve = starve.reshape(-1)
+        for i, occupant in enumerate(self.grid.values()):
+            if occupant is None:
+                continue
+            flat_age[i] = occupant[1]
+            if occupant[0] == "fish":
+                flat_species[i] = FISH
+            else:
+                flat_species[i] = SHARK
+                flat_starve[i] = occupant[2]
+        return {"species": species, "age": age, "starve": starve}
+
+    def set_state(self, arrays, counters=None):
+        """
+        Replace the grid with the arrays returned by get_state. counters
+        is a dict of counter values to restore (see reset_counters); if
+        it is None the populations are recounted and the totals zeroed.
+        """
+        species = arrays["species"].reshape(-1).tolist()
+        age = arrays["age"].reshape(-1).tolist()
+        starve = arrays["starve"].reshape(-1).tolist()
+        for i, cell in enumerate(self.grid):
+            kind = species[i]
+            if kind == FISH:
+                self.grid[cell] = ["fish", age[i]]
+            elif kind == SHARK:
+                self.grid[cell] = ["shark", age[i], starve[i]]
+            else:
+                self.grid[cell] = None
+        self.occupied = None
+        if counters is None:
+            self.reset_counters(species.count(FISH), species.count(SHARK))
+        else:
+            self.__dict__.update(counters)
+
+    def reset_counters(self, num_fish, num_sharks):
+        """
+        Set the live population counts and zero the running totals of
+        births, deaths (starved sharks and eaten fish) and predations
+        (fish eaten). The counters are kept up to date as creatures are
+        born, eaten, starve or get added, so reading them is O(1).
+        """
+        self.num_fish = num_fish
+        self.num_sharks = num_sharks
+        self.births = 0
+        self.deaths = 0
+        self.predations = 0
+
+    def occupied_cells(self):
+        """
+        Return the set of cells that hold a creature. In every update mode
+        but "scan" the set is kept up to date as creatures move, are born
+        and die; in "scan" mode it is built from the grid on every call.
+        """
+        if self.occupied is not None:
+            return self.occupied
+        occupied = {cell for cell, occupant in self.grid.items()
+                        if occupant is not None}
+        if self.update_mode != "scan":
+            self.occupied = occupied
+        return occupied
+
+    def update(self):
+        """Advance the world one tick using the current update mode."""
+        if self.update_mode == "scan":
+            self.scan_update()
+        else:
+            self.ticks += 1
+            self.step_creatures(self.visit_order())
+
+    def visit_order(self):
+        """Return the occupied cells in the order the update mode visits them."""
+        cells = sorted(self.occupied_cells())
+        if self.update_mode == "random":
+            return [cells[i] for i in self.rng.permutation(len(cells)).tolist()]
+        elif self.update_mode == "chromatic":
+            colors = self.rng.permutation(NUM_COLORS).tolist()
+            cells.sort(key=lambda cell: colors[(cell[0] + 2 * cell[1]) % NUM_COLORS])
+        return cells
+
+    def scan_update(self):
+        """
+        Scan every cell of the grid. One uniform value per cell is drawn
+        for the whole tick up front and used to pick that cell's move.
+        """
+        self.ticks += 1
+        rolls = self.rng.random_sample(len(self.grid)).tolist()
+        for i, cell in enumerate(self.grid):
+            occupant = self.grid[cell]
+            if occupant is None:
+                continue
+            vacant, fishes = self.get_neighbors(cell)
+            if occupant[0] == "fish":
+                occupant[1] += 1
+                if vacant:
+                    new_spot = vacant[int(rolls[i] * len(vacant))]
+                    self.grid[new_spot] = self.grid[cell]
+                    if occupant[1] >= self.fish_reproduce_age:
+                        self.grid[new_spot][1] = 0
+                        self.grid[cell] = ["fish", 0]
+                        self.num_fish += 1
+                        self.births += 1
+                    else:
+                        self.grid[cell] = None
+
+            elif occupant[0] == "shark":
+                occupant[1] += 1
+                occupant[2] -= 1
+                if occupant[2] <= 0:
+                    self.grid[cell] = None
+                    self.num_sharks -= 1
+                    self.deaths += 1
+                else:
+                    if fishes:
+                        dest = fishes[int(rolls[i] * len(fishes))]
+                        self.grid[cell][2] = self.shark_starve_time
+                        self.move_shark(cell, dest)
+                    elif vacant:
+                        dest = vacant[int(rolls[i] * len(vacant))]
+                        self.move_shark(cell, dest)
+
+    def step_creatures(self, cells):
+        """
+        Step the creatures in cells, in that order, with one uniform value
+        drawn per creature to pick its move. A creature that has moved on
+        is not stepped again.
+        """
+        grid = self.grid
+        occupied = self.occupied_cells()
+        starting = [grid[cell] for cell in cells]
+        rolls = self.rng.random_sample(len(cells)).tolist()
+        for cell, occupant, roll in zip(cells, starting, rolls):
+            if grid[cell] is not occupant:
+                #Eaten earlier in the tick.
+                continue
+            vacant, fishes = self.get_neighbors(cell)
+            occupant[1] += 1
+            if occupant[0] == "fish":
+                if not vacant:
+                    continue
+                dest = vacant[int(roll * len(vacant))]
+                grid[dest] = occupant
+                if occupant[1] >= self.fish_reproduce_age:
+                    occupant[1] = 0
+                    grid[cell] = ["fish", 0]
+                    self.num_fish += 1
+                    self.births += 1
+                else:
+                    grid[cell] = None
+            else:
+                occupant[2] -= 1
+                if occupant[2] <= 0:
+                    grid[cell] = None
+                    occupied.discard(cell)
+                    self.num_sharks -= 1
+                    self.deaths += 1
+                    continue
+                if fishes:
+                    dest = fishes[int(roll * len(fishes))]
+                    occupant[2] = self.shark_starve_time
+                elif vacant:
+                    dest = vacant[int(roll * len(vacant))]
+                else:
+                    continue
+                self.move_shark(cell, dest)
+            occupied.add(dest)
+            if grid[cell] is None:
+                occupied.discard(cell)
+
+    def add_fish(self):
+        indx = self.random_cell()
+        self.remove_occupant(indx)
+        self.grid[indx] = ["fish", 0]
+        self.num_fish += 1
+        if self.occupied is not None:
+            self.occupied.add(indx)
+
+    def add_shark(self):
+        indx = self.random_cell()
+        self.remove_occupant(indx)
+        self.grid[indx] = ["shark", 0, self.shark_starve_time]
+        self.num_sharks += 1
+        if self.occupied is not None:
+            self.occupied.add(indx)
+
+    def random_cell(self):
+        return (int(self.rng.randint(self.num_columns)),
+                   int(self.rng.randint(self.num_rows)))
+
+    def remove_occupant(self, indx):
+        """Empty the cell at indx, keeping the population counts in step."""
+        occupant = self.grid[indx]
+        if occupant is None:
+            return
+        if occupant[0] == "fish":
+            self.num_fish -= 1
+        else:
+            self.num_sharks -= 1
+        self.grid[indx] = None
+        if self.occupied is not None:
+            self.occupied.discard(indx)
+                
+    def move_shark(self, cell, dest):
+        if self.grid[dest] is not None:
+            self.num_fish -= 1
+            self.deaths += 1
+            self.predations += 1
+        self.grid[dest] = self.grid[cell]
+        if self.grid[dest][1] >= self.shark_reproduce_age:
+            self.grid[cell] = ["shark", 0, self.shark_starve_time]
+            self.grid[dest][1] = 0
+            self.num_sharks += 1
+            self.births += 1
+        else:
+            self.grid[cell] = None
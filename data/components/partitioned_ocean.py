@@ -0,0 +1,261 @@
+"""
+A multi-core ArrayOcean. The ocean arrays live in shared memory and the
+grid is cut into vertical strips of whole columns (columns are contiguous
+in memory, so a strip is one block of each array). A pool of worker
+processes steps the strips with the vectorized rules.
+
+A creature moves at most one cell, so a strip's update reads and writes
+its own columns plus one halo column on either side. Every tick runs in
+two phases: first the even strips, then the odd ones. With an even
+number of strips at least two columns wide, strips stepped in the same
+phase never share a column, halo or not, so they run in parallel
+without locks. Wrapping works as it does for ArrayOcean: the first and
+last strips are neighbors and every strip wraps top to bottom.
+
+Creatures an even strip moves into an odd strip's edge column have
+already acted this tick. The even phase reports those cells and the odd
+phase leaves them out, so nothing acts twice.
+
+Each strip draws from its own RandomState seeded by (seed, tick, strip).
+A run therefore depends on the seed and the number of strips, not on
+the number of workers or on how the strips were scheduled.
+"""
+
+import multiprocessing
+import time
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .array_ocean import ArrayOcean
+from .neighbors import make_neighbor_table
+from .ocean import WATER
+
+
+COUNTERS = ("num_fish", "num_sharks", "births", "deaths", "predations")
+
+#Without a "strips" setting the grid gets a strip per STRIP_COLUMNS
+#columns, up to MAX_STRIPS. The count depends only on the grid, so a seed
+#gives the same run on any machine.
+STRIP_COLUMNS = 64
+MAX_STRIPS = 64
+
+#Set in each worker process by attach().
+_SHARED = None
+
+
+def make_strips(num_columns, num_strips):
+    """
+    Return the (start, stop) columns of each strip, or None if the grid is
+    too narrow for two strips of at least two columns. An odd number of
+    strips is rounded down to an even one.
+    """
+    num_strips = min(num_strips, num_columns // 2)
+    num_strips -= num_strips % 2
+    if num_strips < 2:
+        return None
+    edges = np.linspace(0, num_columns, num_strips + 1).astype(int).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+class StripOcean(ArrayOcean):
+    """
+    The ArrayOcean a worker steps one strip with: a window of the strip's
+    columns plus a halo column either side. Counters start at zero, so
+    after a step they hold the strip's changes.
+    """
+    tables = {}
+    def __init__(self, species, age, starve, settings, seed):
+        self.num_columns, self.num_rows = species.shape
+        self.num_cells = species.size
+        (self.fish_reproduce_age, self.shark_reproduce_age,
+         self.shark_starve_time) = settings
+        self.species = species
+        self.age = age
+        self.starve = starve
+        self.seed = seed
+        self.rng = np.random.RandomState(seed)
+        dims = self.num_columns, self.num_rows
+        if dims not in StripOcean.tables:
+            StripOcean.tables[dims] = (make_neighbor_table(*dims),
+                                                  np.full(self.num_cells, -1, dtype=np.int32))
+        self.neighbor_table, self.claims = StripOcean.tables[dims]
+        self.reset_counters(0, 0)
+
+
+def step_strip(arrays, task):
+    """
+    Step one strip of the shared arrays. Returns the flat indexes of the
+    creatures that moved into the halo and the strip's counter changes.
+    """
+    species, age, starve = arrays
+    index, start, stop, seed, tick, settings, arrived = task
+    num_columns, num_rows = species.shape
+    if start >= 1 and stop < num_columns:
+        columns = slice(start - 1, stop + 1)
+    else:
+        columns = np.arange(start - 1, stop + 1) % num_columns
+    #Slices are views, so interior strips are stepped in place; the
+    #strips that wrap around get a copy that is written back.
+    window = [arr[columns] for arr in arrays]
+    width = stop - start
+    halo = window[0][[0, -1]].copy()
+    active = np.zeros(window[0].shape, dtype=bool)
+    active[1:width + 1] = True
+    if len(arrived):
+        x, y = np.divmod(np.asarray(arrived), num_rows)
+        active[(x - start + 1) % num_columns, y] = False
+    strip = StripOcean(window[0], window[1], window[2], settings,
+                                [seed, tick, index])
+    strip.vector_update(active)
+    if not isinstance(columns, slice):
+        for arr, part in zip(arrays, window):
+            arr[columns] = part
+    after = window[0][[0, -1]]
+    side, y = np.nonzero((after != halo) & (after != WATER))
+    x = np.where(side == 0, start - 1, stop) % num_columns
+    moved_in = (x * num_rows + y).tolist()
+    return moved_in, [getattr(strip, name) for name in COUNTERS]
+
+
+def attach(names, shape):
+    """Pool initializer: map the shared ocean arrays into this worker."""
+    global _SHARED
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    dtypes = (np.uint8, np.int32, np.int32)
+    arrays = [np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                  for dtype, block in zip(dtypes, blocks)]
+    _SHARED = blocks, arrays
+
+
+def pool_step(task):
+    return step_strip(_SHARED[1], task)
+
+
+#Seconds the workers get to exit before they are killed.
+STOP_TIMEOUT = 2.0
+
+
+def stop_pool(pool):
+    """
+    Stop the workers of pool. Closing the pool tells idle workers to exit;
+    any still running after STOP_TIMEOUT seconds are killed (they hold
+    nothing that needs saving). Pool.terminate is not used: it waits for
+    the workers without a timeout and deadlocks on a killed one.
+    """
+    pool.close()
+    deadline = time.time() + STOP_TIMEOUT
+    for worker in pool._pool:
+        worker.join(max(deadline - time.time(), 0))
+        if worker.is_alive():
+            worker.kill()
+    pool.join()
+
+
+def release(blocks, pool):
+    if pool[0] is not None:
+        stop_pool(pool[0])
+    for block in blocks:
+        block.unlink()
+        try:
+            block.close()
+        except BufferError:
+            #Arrays still using the block keep it mapped until they go.
+            pass
+
+
+class PartitionedOcean(ArrayOcean):
+    """
+    An ArrayOcean stepped strip by strip across "workers" processes (all
+    cores if None). "strips" sets the number of strips (one per
+    STRIP_COLUMNS columns if None); grids too narrow for two strips are
+    stepped with the plain vectorized update. The update mode is always "vectorized".
+    """
+    def __init__(self, setup_dict):
+        d = setup_dict
+        self.workers = d["workers"] or multiprocessing.cpu_count()
+        self.blocks = []
+        self.pool = [None]
+        super(PartitionedOcean, self).__init__(dict(setup_dict, **{
+                "update mode": "vectorized"}))
+        self.num_strips = d["strips"] or min(
+                max(self.num_columns // STRIP_COLUMNS, 2), MAX_STRIPS)
+        self.strips = make_strips(self.num_columns, self.num_strips)
+        #Workers and shared memory go when the ocean does (or on close).
+        self.finalizer = weakref.finalize(self, release, self.blocks, self.pool)
+
+    def allocate(self, dtype):
+        shape = self.num_columns, self.num_rows
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        self.blocks.append(block)
+        arr = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        arr[:] = 0
+        return arr
+
+    def set_state(self, arrays, counters=None):
+        """Copy the arrays from a get_state dict into the shared arrays."""
+        if self.species is None:
+            self.species = self.allocate(np.uint8)
+            self.age = self.allocate(np.int32)
+            self.starve = self.allocate(np.int32)
+        shared = self.get_state()
+        for name in shared:
+            shared[name][:] = arrays[name]
+        super(PartitionedOcean, self).set_state(shared, counters)
+
+    def close(self):
+        """Stop the workers and free the shared memory."""
+        self.finalizer()
+
+    def start_pool(self):
+        names = [block.name for block in self.blocks[-3:]]
+        context = multiprocessing.get_context("spawn")
+        self.pool[0] = context.Pool(self.workers, initializer=attach,
+                                              initargs=(names, self.species.shape))
+
+    def update(self):
+        self.ticks += 1
+        if self.strips is None:
+            #Strips use their own tables (StripOcean.tables); the grid's
+            #are only built for grids too narrow to split.
+            self.build_neighbor_table()
+            self.vector_update()
+            return
+        if self.workers > 1 and self.pool[0] is None:
+            self.start_pool()
+        settings = (self.fish_reproduce_age, self.shark_reproduce_age,
+                        self.shark_starve_time)
+        arrived = {}
+        for parity in (0, 1):
+            tasks = []
+            for index in range(parity, len(self.strips), 2):
+                start, stop = self.strips[index]
+                tasks.append((index, start, stop, self.seed, self.ticks,
+                                   settings, arrived.get(index, [])))
+            if self.pool[0] is None:
+                arrays = self.species, self.age, self.starve
+                results = [step_strip(arrays, task) for task in tasks]
+            else:
+                results = self.pool[0].map(pool_step, tasks)
+            for task, (moved_in, changes) in zip(tasks, results):
+                index = task[0]
+                for name, change in zip(COUNTERS, changes):
+                    setattr(self, name, getattr(self, name) + change)
+                if parity == 0:
+                    self.hand_over(index, moved_in, arrived)
+
+    def hand_over(self, index, moved_in, arrived):
+        """
+        Pass the creatures strip index moved into its halo to the strips
+        that own those columns, so they are not stepped again this tick.
+        """
+        num_strips = len(self.strips)
+        left = (index - 1) % num_strips
+        right = (index + 1) % num_strips
+        left_start, left_stop = self.strips[left]
+        for cell in moved_in:
+            x = cell // self.num_rows
+            owner = left if left_start <= x < left_stop else right
+            arrived.setdefault(owner, []).append(cell)
@@ -0,0 +1,129 @@
+"""
+Per-frame timings of the phases of the main loop. Code to be timed is
+wrapped in "with PROFILER.phase(name):"; the time spent in each phase is
+summed over a frame and kept, per phase, in a RingBuffer of the most
+recent frames (in microseconds), from which ProfileOverlay shows rolling
+percentiles. Phases can nest, e.g. "world.draw" inside "draw".
+"""
+
+import csv
+import time
+from contextlib import contextmanager
+
+import pygame as pg
+
+from .history import RingBuffer
+
+
+def percentile(ordered, fraction):
+    """Return the value at fraction (0 to 1) of a sorted list."""
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+class Profiler(object):
+    def __init__(self, capacity=600):
+        self.capacity = capacity
+        self.names = []
+        self.timings = {}
+        self.current = {}
+        self.frames = 0
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        """Add time measured elsewhere (e.g. on another thread) to a phase."""
+        self.current[name] = self.current.get(name, 0.0) + seconds
+
+    def end_frame(self):
+        """Record the current frame's phase totals and start a new frame."""
+        for name in self.current:
+            if name not in self.timings:
+                #Phases first seen now took no time in earlier frames.
+                self.names.append(name)
+                self.timings[name] = RingBuffer(self.capacity)
+                for _ in range(min(self.frames, self.capacity)):
+                    self.timings[name].append(0)
+        for name in self.names:
+            self.timings[name].append(int(self.current.get(name, 0.0) * 1e6))
+        self.current = {}
+        self.frames += 1
+
+    def stats(self):
+        """Return a list of (name, p50, p95, max) in ms for every phase."""
+        stats = []
+        for name in self.names:
+            timings = self.timings[name]
+            ordered = sorted(timings.values())
+            stats.append((name, percentile(ordered, .5) / 1000.,
+                               percentile(ordered, .95) / 1000., timings.max / 1000.))
+        return stats
+
+    def write_csv(self, path):
+        """Write the buffered timings in ms, one row per frame."""
+        columns = [self.timings[name].values() for name in self.names]
+        first = self.frames - min(self.frames, self.capacity)
+        with open(path, "w") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + self.names)
+            for i, row in enumerate(zip(*columns)):
+                writer.writerow([first + i] + [value / 1000. for value in row])
+
+
+#The profiler shared by Control and the states.
+PROFILER = Profiler()
+
+
+class ProfileOverlay(object):
+    """
+    Shows p50, p95 and max of every phase of a Profiler in the top right
+    corner of the screen. The text is only re-rendered every refresh ms.
+    """
+    def __init__(self, profiler, refresh=500):
+        self.profiler = profiler
+        self.refresh = refresh
+        self.font = pg.font.Font(None, 18)
+        self.text_color = pg.Color("white")
+        self.bg_color = (0, 0, 0)
+        self.image = None
+        self.timer = refresh
+
+    def render(self):
+        rows = [("phase (ms)", "p50", "p95", "max")]
+        for name, p50, p95, most in self.profiler.stats():
+            rows.append((name, "{:.2f}".format(p50), "{:.2f}".format(p95),
+                                "{:.2f}".format(most)))
+        cells = [[self.font.render(text, True, self.text_color) for text in row]
+                    for row in rows]
+        widths = [max(row[i].get_width() for row in cells) + 12
+                       for i in range(len(rows[0]))]
+        line_height = self.font.get_linesize()
+        self.image = pg.Surface((sum(widths) + 8, line_height * len(rows) + 8))
+        self.image.fill(self.bg_color)
+        self.image.set_alpha(200)
+        for y, row in enumerate(cells):
+            right = 4
+            for i, cell in enumerate(row):
+                right += widths[i]
+                if i == 0:
+                    pos = 4, 4 + y * line_height
+                else:
+                    pos = right - cell.get_width(), 4 + y * line_height
+                self.image.blit(cell, pos)
+
+    def update(self, dt):
+        self.timer += dt
+        if self.timer >= self.refresh:
+            self.timer = 0
+            self.render()
+
+    def draw(self, surface):
+        """Draw the overlay and return the rect it covers."""
+        rect = self.image.get_rect(topright=surface.get_rect().topright)
+        surface.blit(self.image, rect)
+        return rect
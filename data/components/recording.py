@@ -0,0 +1,181 @@
+"""
+Streaming tick logs of the species grid, for replaying a simulation
+without re-running it. A Recorder appends one record per tick: a keyframe
+holding the whole grid every keyframe_interval ticks and, in between, a
+delta holding only the cells that changed. A Player reads the log back
+and can seek to any recorded tick by starting from the nearest keyframe
+at or before it, so a seek applies at most keyframe_interval deltas.
+
+File layout:
+
+    8 bytes   MAGIC
+    8 bytes   length of the JSON header, little-endian unsigned
+    n bytes   JSON header (utf-8): columns, rows, seed, keyframe interval
+    records   each a RECORD head (kind, tick, number of fish, number of
+              sharks, payload length) followed by a zlib compressed payload
+
+A keyframe payload is the species array as bytes. A delta payload is the
+changed cells' flat indexes as little-endian uint32s followed by their
+new species, one byte each. Records are written as they happen, so a log
+cut short (e.g. by a crash) can still be played up to its last full record.
+"""
+
+import bisect
+import json
+import struct
+import zlib
+
+import numpy as np
+
+
+MAGIC = b"WATORLG1"
+RECORD = struct.Struct("<cIIII")
+KEYFRAME = b"K"
+DELTA = b"D"
+
+
+class Recorder(object):
+    """Writes a tick log of ocean to path, starting with its current state."""
+    def __init__(self, ocean, path, keyframe_interval=100):
+        self.path = path
+        self.keyframe_interval = max(keyframe_interval, 1)
+        self.file = open(path, "wb")
+        header = json.dumps({
+                "columns": ocean.num_columns,
+                "rows": ocean.num_rows,
+                "seed": ocean.seed,
+                "keyframe interval": self.keyframe_interval}).encode("utf-8")
+        self.file.write(MAGIC)
+        self.file.write(struct.pack("<Q", len(header)))
+        self.file.write(header)
+        self.previous = None
+        self.since_keyframe = 0
+        self.record(ocean)
+
+    def record(self, ocean):
+        """Append a record of ocean's current species grid."""
+        species = ocean.get_state()["species"].reshape(-1)
+        if self.previous is None or self.since_keyframe >= self.keyframe_interval:
+            self.previous = species.copy()
+            self.since_keyframe = 0
+            kind = KEYFRAME
+            payload = self.previous.tobytes()
+        else:
+            changed = np.flatnonzero(species != self.previous)
+            values = species[changed]
+            self.previous[changed] = values
+            kind = DELTA
+            payload = changed.astype("<u4").tobytes() + values.tobytes()
+        self.since_keyframe += 1
+        payload = zlib.compress(payload, 1)
+        self.file.write(RECORD.pack(kind, ocean.ticks, ocean.num_fish,
+                                                   ocean.num_sharks, len(payload)))
+        self.file.write(payload)
+
+    def close(self):
+        self.file.close()
+
+
+class Player(object):
+    """
+    Plays back a tick log. The record heads are indexed when the log is
+    opened; payloads are only read when seeking needs them. species holds
+    the grid at the current tick as a (num_columns, num_rows) array.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        if self.file.read(len(MAGIC)) != MAGIC:
+            self.file.close()
+            raise ValueError("{} is not a Wa-Tor tick log".format(path))
+        length = struct.unpack("<Q", self.file.read(8))[0]
+        header = json.loads(self.file.read(length).decode("utf-8"))
+        self.num_columns = header["columns"]
+        self.num_rows = header["rows"]
+        self.seed = header["seed"]
+        self.keyframe_interval = header["keyframe interval"]
+        self.index_records()
+        if not self.ticks:
+            self.file.close()
+            raise ValueError("{} has no records".format(path))
+        self.species = np.zeros((self.num_columns, self.num_rows), dtype=np.uint8)
+        self.position = None
+        self.seek(self.ticks[0])
+
+    def index_records(self):
+        """Read every record head, skipping over the payloads."""
+        self.ticks = []
+        self.kinds = []
+        self.offsets = []
+        self.fish_counts = []
+        self.shark_counts = []
+        self.keyframes = []
+        while True:
+            head = self.file.read(RECORD.size)
+            if len(head) < RECORD.size:
+                break
+            kind, tick, num_fish, num_sharks, length = RECORD.unpack(head)
+            offset = self.file.tell()
+            self.file.seek(length, 1)
+            if self.file.tell() - offset < length:
+                break
+            if kind == KEYFRAME:
+                self.keyframes.append(len(self.ticks))
+            self.ticks.append(tick)
+            self.kinds.append(kind)
+            self.offsets.append((offset, length))
+            self.fish_counts.append(num_fish)
+            self.shark_counts.append(num_sharks)
+
+    @property
+    def first_tick(self):
+        return self.ticks[0]
+
+    @property
+    def last_tick(self):
+        return self.ticks[-1]
+
+    @property
+    def tick(self):
+        return self.ticks[self.position]
+
+    @property
+    def num_fish(self):
+        return self.fish_counts[self.position]
+
+    @property
+    def num_sharks(self):
+        return self.shark_counts[self.position]
+
+    def seek(self, tick):
+        """
+        Make species the grid as it was at tick, or at the last recorded
+        tick before it. Seeking forward from the current position applies
+        the deltas in between unless starting over from a later keyframe
+        is shorter.
+        """
+        target = max(bisect.bisect_right(self.ticks, tick) - 1, 0)
+        keyframe = self.keyframes[bisect.bisect_right(self.keyframes, target) - 1]
+        if self.position is not None and keyframe <= self.position <= target:
+            start = self.position + 1
+        else:
+            start = keyframe
+        for i in range(start, target + 1):
+            self.apply(i)
+        self.position = target
+        return self.tick
+
+    def apply(self, i):
+        offset, length = self.offsets[i]
+        self.file.seek(offset)
+        payload = zlib.decompress(self.file.read(length))
+        flat = self.species.reshape(-1)
+        if self.kinds[i] == KEYFRAME:
+            flat[:] = np.frombuffer(payload, dtype=np.uint8)
+        else:
+            count = len(payload) // 5
+            changed = np.frombuffer(payload, dtype="<u4", count=count)
+            flat[changed] = np.frombuffer(payload, dtype=np.uint8, offset=count * 4)
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,99 @@
+"""
+Initial placement of fish and sharks. Every placement picks creatures
+from a single random permutation of the allowed cells, so building a
+world is O(cells) however many creatures it starts with.
+
+The "placement" setup param chooses which cells are allowed:
+
+    "uniform"   every cell
+    "clusters"  discs of "cluster radius" cells around "cluster count"
+                random centers
+    "stripes"   vertical bands "stripe width" cells wide, every other band
+    "mask"      cells whose pixel in the image at "mask" is bright (the
+                image is stretched to the grid)
+    None        no cells; the ocean starts empty and is filled in
+                afterwards (see snapshot.load)
+
+Populations come from "num fish" and "num sharks", or from "fish density"
+and "shark density" (fractions of the allowed cells) when those are set.
+Fish are placed first and sharks fill the following cells of the same
+permutation, so they never overlap.
+"""
+
+import numpy as np
+
+
+def allowed_cells(setup_dict, num_columns, num_rows, rng):
+    """Return the sorted flat indexes of the cells the placement allows."""
+    d = setup_dict
+    placement = d["placement"]
+    if placement is None:
+        return np.arange(0)
+    elif placement == "uniform":
+        return np.arange(num_columns * num_rows)
+    elif placement == "clusters":
+        mask = cluster_mask(num_columns, num_rows, d["cluster count"],
+                                     d["cluster radius"], rng)
+    elif placement == "stripes":
+        width = max(d["stripe width"], 1)
+        bands = (np.arange(num_columns) // width) % 2 == 0
+        mask = np.repeat(bands[:, None], num_rows, axis=1)
+    elif placement == "mask":
+        mask = image_mask(d["mask"], num_columns, num_rows)
+    else:
+        raise ValueError("Unknown placement: {}".format(placement))
+    return np.flatnonzero(mask)
+
+
+def cluster_mask(num_columns, num_rows, count, radius, rng):
+    """
+    Return a (num_columns, num_rows) bool array that is True within
+    radius of any of count random centers, wrapping around the edges.
+    Only the cells of each disc are touched, so the cost is
+    O(count * radius**2) on top of allocating the mask.
+    """
+    mask = np.zeros((num_columns, num_rows), dtype=bool)
+    span = np.arange(-radius, radius + 1)
+    dx, dy = np.meshgrid(span, span, indexing="ij")
+    inside = dx * dx + dy * dy <= radius * radius
+    dx, dy = dx[inside], dy[inside]
+    xs = rng.randint(num_columns, size=count)
+    ys = rng.randint(num_rows, size=count)
+    for x, y in zip(xs, ys):
+        mask[(x + dx) % num_columns, (y + dy) % num_rows] = True
+    return mask
+
+
+def image_mask(path, num_columns, num_rows):
+    """
+    Return a (num_columns, num_rows) bool array that is True where the
+    image at path, stretched to the grid, is brighter than mid gray.
+    pygame is only imported here so headless runs that don't use a mask
+    never load it.
+    """
+    import pygame as pg
+    img = pg.transform.scale(pg.image.load(path), (num_columns, num_rows))
+    return pg.surfarray.array3d(img).mean(axis=2) > 127
+
+
+def population(setup_dict, kind, available):
+    """Return how many of kind ("fish" or "sharks") to place."""
+    density = setup_dict["fish density" if kind == "fish" else "shark density"]
+    if density is not None:
+        return int(round(density * available))
+    return setup_dict["num " + kind]
+
+
+def place_creatures(setup_dict, num_columns, num_rows, rng):
+    """
+    Return (fish, sharks), two arrays of the flat indexes of the cells
+    to start fish and sharks in.
+    """
+    cells = allowed_cells(setup_dict, num_columns, num_rows, rng)
+    num_fish = min(population(setup_dict, "fish", len(cells)), len(cells))
+    num_sharks = population(setup_dict, "sharks", len(cells))
+    num_sharks = min(num_sharks, len(cells) - num_fish)
+    if num_fish + num_sharks == 0:
+        return cells[:0], cells[:0]
+    chosen = cells[rng.permutation(len(cells))[:num_fish + num_sharks]]
+    return chosen[:num_fish], chosen[num_fish:]
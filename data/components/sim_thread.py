@@ -0,0 +1,180 @@
+"""
+Steps a world on a background thread so the simulation rate is
+independent of the frame rate. A slow tick only delays the next tick;
+the render loop keeps drawing the last completed frame and stays
+responsive.
+
+Only the sim thread touches the world's simulation state while it runs.
+Anything else that needs to change the world (adding creatures, saving a
+snapshot, ...) is passed to call() and runs on the sim thread between
+ticks. After every tick the populations are queued for the render loop
+to collect with take_reports() (populations always holds the latest
+pair), and when the render loop has asked for one with request_frame()
+the world captures a copy of what it should draw
+(world.capture_frame()) into world.frame. A frame requested with now
+set (e.g. after the view has moved) is captured straight after the
+current tick, even while paused.
+
+At tick length 0 (turbo) ticks run back to back in batches sized to
+take about budget seconds each: the frame is only captured after a batch
+and the thread yields to the render loop between batches, so the number
+of ticks per frame adapts to how expensive a tick is.
+
+The NumPy engines release the GIL inside their array operations, so the
+vectorized update runs largely in parallel with drawing; the dict engine
+shares the GIL with the render loop.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class SimThread(threading.Thread):
+    """
+    Runs world.update() every tick_length ms, or as fast as possible when
+    tick_length is 0. on_tick, if given, is called on the sim thread with
+    the world after every tick.
+    """
+    def __init__(self, world, tick_length, on_tick=None, budget=1 / 60.):
+        super(SimThread, self).__init__()
+        self.daemon = True
+        self.world = world
+        self.tick_length = tick_length
+        self.on_tick = on_tick
+        self.budget = budget
+        self.batch = 1
+        self.paused = False
+        self.stopped = False
+        self.wake = threading.Event()
+        self.calls = deque()
+        self.reports = deque()
+        self.frame_wanted = True
+        self.frame_now = False
+        self.length_changed = False
+        self.populations = world.num_fish, world.num_sharks
+
+    def call(self, func, *args):
+        """Run func(*args) on the sim thread before its next tick."""
+        self.calls.append((func, args))
+        self.wake.set()
+
+    def set_tick_length(self, tick_length):
+        if tick_length != self.tick_length:
+            self.tick_length = tick_length
+            self.length_changed = True
+            self.wake.set()
+
+    def set_paused(self, paused):
+        self.paused = paused
+        self.wake.set()
+
+    def request_frame(self, now=False):
+        """
+        Ask for world.frame to be refreshed after the next tick or, if
+        now, as soon as the current one is done.
+        """
+        self.frame_wanted = True
+        if now:
+            self.frame_now = True
+            self.wake.set()
+
+    def take_reports(self):
+        """
+        Return a list of (num_fish, num_sharks, seconds) for every tick
+        completed since the last call, seconds being how long the tick
+        took.
+        """
+        reports = []
+        while self.reports:
+            reports.append(self.reports.popleft())
+        return reports
+
+    def stop(self):
+        """Stop the thread after its current tick and wait for it."""
+        self.stopped = True
+        self.wake.set()
+        if self.is_alive():
+            self.join()
+
+    def run_calls(self):
+        ran = False
+        while self.calls:
+            func, args = self.calls.popleft()
+            func(*args)
+            ran = True
+        return ran
+
+    def publish(self):
+        world = self.world
+        self.populations = world.num_fish, world.num_sharks
+        if self.frame_wanted:
+            self.frame_wanted = False
+            world.frame = world.capture_frame()
+
+    def step(self):
+        """Run one tick and queue its report."""
+        world = self.world
+        start = time.perf_counter()
+        world.update()
+        if self.on_tick is not None:
+            self.on_tick(world)
+        self.reports.append((world.num_fish, world.num_sharks,
+                                       time.perf_counter() - start))
+
+    def run_batch(self):
+        """
+        Run up to self.batch ticks, stopping early if anything needs the
+        thread's attention, then size the next batch to fill the budget.
+        The batch grows at most twofold at a time so one quick batch
+        can't make the next overshoot badly.
+        """
+        start = time.perf_counter()
+        done = 0
+        while done < self.batch:
+            self.step()
+            done += 1
+            if self.stopped or self.paused or self.calls or self.tick_length:
+                break
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        fit = int(done * self.budget / elapsed)
+        self.batch = max(1, min(fit, self.batch * 2))
+
+    def run(self):
+        self.world.frame = self.world.capture_frame()
+        next_tick = time.perf_counter()
+        while not self.stopped:
+            self.wake.clear()
+            if self.run_calls() or self.frame_now:
+                self.frame_now = False
+                self.frame_wanted = True
+                self.publish()
+            now = time.perf_counter()
+            if self.length_changed:
+                #A shorter tick starts now rather than after the rest of
+                #the old, longer interval.
+                self.length_changed = False
+                next_tick = min(next_tick, now + self.tick_length / 1000.)
+            if self.paused:
+                delay = None
+            elif self.tick_length:
+                delay = next_tick - now
+            else:
+                delay = 0
+            if delay is None or delay > 0:
+                self.wake.wait(delay)
+                continue
+            if self.tick_length:
+                self.step()
+                self.publish()
+                #Start the next interval from now if this tick ran late, so
+                #slow ticks never pile up into a backlog.
+                next_tick = max(next_tick + self.tick_length / 1000.,
+                                       time.perf_counter())
+            else:
+                self.run_batch()
+                self.publish()
+                #Let the render loop have the GIL before the next batch.
+                time.sleep(0)
+                next_tick = time.perf_counter()
+        self.run_calls()
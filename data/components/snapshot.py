@@ -0,0 +1,137 @@
+"""
+Save and load complete Wa-Tor states. A snapshot holds the grid
+dimensions, the species, age and starve arrays, the tick count, the
+population counters, the RNG seed and state and the simulation params,
+so a loaded ocean carries on exactly where the saved one left off.
+
+File layout:
+
+    8 bytes   MAGIC
+    8 bytes   length of the JSON header, little-endian unsigned
+    n bytes   JSON header (utf-8)
+    data      the raw little-endian arrays, each starting at a 64-byte
+              aligned offset recorded in the header
+
+The arrays are raw so load can memory-map them: only the pages a tick
+or a draw actually touches are read, and nothing is copied until it is
+written to (the maps are copy-on-write, so the file never changes).
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+
+MAGIC = b"WATORSN1"
+ALIGN = 64
+ARRAYS = (("species", "<u1"), ("age", "<i4"), ("starve", "<i4"))
+SIM_PARAMS = {
+        "fish reproduce age": "fish_reproduce_age",
+        "shark reproduce age": "shark_reproduce_age",
+        "shark starve time": "shark_starve_time",
+        "update mode": "update_mode"}
+COUNTERS = ("num_fish", "num_sharks", "births", "deaths", "predations")
+
+
+def aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def save(ocean, path):
+    """Write a snapshot of ocean (an Ocean or ArrayOcean) to path."""
+    state = ocean.get_state()
+    rng_state = ocean.rng.get_state()
+    header = {
+            "columns": ocean.num_columns,
+            "rows": ocean.num_rows,
+            "ticks": ocean.ticks,
+            "seed": ocean.seed,
+            "rng": [rng_state[0], rng_state[1].tolist()] + list(rng_state[2:]),
+            "params": {key: getattr(ocean, attr)
+                            for key, attr in SIM_PARAMS.items()
+                            if hasattr(ocean, attr)},
+            "counters": {name: getattr(ocean, name) for name in COUNTERS},
+            "arrays": []}
+    offset = 0
+    for name, dtype in ARRAYS:
+        header["arrays"].append({"name": name, "dtype": dtype, "offset": offset})
+        offset = aligned(offset + state[name].size * np.dtype(dtype).itemsize)
+    encoded = json.dumps(header).encode("utf-8")
+    data_start = aligned(len(MAGIC) + 8 + len(encoded))
+    #The arrays may be memory maps of the file at path (an ocean loaded
+    #from it and saved again), so write a new file and move it over path
+    #rather than truncating path while they are still read from it.
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(encoded)))
+            f.write(encoded)
+            for info in header["arrays"]:
+                f.seek(data_start + info["offset"])
+                arr = np.ascontiguousarray(state[info["name"]], dtype=info["dtype"])
+                arr.tofile(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_header(path):
+    """Return (header, data_start) for the snapshot at path."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a Wa-Tor snapshot".format(path))
+        length = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(length).decode("utf-8"))
+    return header, aligned(len(MAGIC) + 8 + length)
+
+
+def load(path, ocean_class, setup_dict, mmap=True):
+    """
+    Return an instance of ocean_class restored from the snapshot at path.
+    setup_dict supplies anything the snapshot doesn't hold (e.g. the
+    topleft and cell size of a WatorWorld); the snapshot's dimensions,
+    seed and simulation params override it, except for an update mode
+    that ocean_class doesn't have. With mmap the arrays are
+    copy-on-write memory maps of the file, otherwise they are read in.
+    """
+    header, data_start = read_header(path)
+    params = dict(setup_dict)
+    params.update(header["params"])
+    #Snapshots load into any engine. One saved in a mode ocean_class
+    #lacks (e.g. "vectorized" into the dict engine) takes the mode of
+    #setup_dict instead.
+    if params.get("update mode") not in ocean_class.update_modes:
+        params["update mode"] = setup_dict["update mode"]
+    params.update({
+            "columns": header["columns"],
+            "rows": header["rows"],
+            "seed": header["seed"],
+            "num fish": 0,
+            "num sharks": 0,
+            "fish density": None,
+            "shark density": None,
+            "placement": None})
+    ocean = ocean_class(params)
+    shape = header["columns"], header["rows"]
+    arrays = {}
+    for info in header["arrays"]:
+        offset = data_start + info["offset"]
+        if mmap:
+            arrays[info["name"]] = np.memmap(path, dtype=info["dtype"], mode="c",
+                                                           offset=offset, shape=shape)
+        else:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                count = shape[0] * shape[1]
+                arr = np.fromfile(f, dtype=info["dtype"], count=count)
+            arrays[info["name"]] = arr.reshape(shape)
+    ocean.set_state(arrays, header["counters"])
+    ocean.ticks = header["ticks"]
+    rng = header["rng"]
+    ocean.rng.set_state((rng[0], np.array(rng[1], dtype=np.uint32)) + tuple(rng[2:]))
+    return ocean
@@ -0,0 +1,64 @@
+"""
+Fish and shark images prepared for the cell size of the world drawing
+them. The images are drawn for ART_CELL_SIZE pixel cells; for the cell
+size in use each image is scaled once, with the same pixel-art look, onto
+a cell-sized tile of the water color and converted to the display
+format, so drawing a creature is a single opaque blit whatever the zoom.
+Below MIN_SPRITE_SIZE the images are too small to make out, so worlds
+fill those cells with the creature's color instead.
+"""
+
+import pygame as pg
+
+
+#The cell size the creature images are drawn for.
+ART_CELL_SIZE = 8
+
+#Cells smaller than this are drawn as flat squares of color.
+MIN_SPRITE_SIZE = 3
+
+
+class SpriteCache(object):
+    """
+    Tiles of creature images keyed by (image, cell size, background).
+    Only the tiles for one cell size are kept: asking for another size
+    empties the cache.
+    """
+    def __init__(self):
+        self.cell_size = None
+        self.tiles = {}
+
+    def get(self, image, cell_size, background):
+        """
+        Return a cell_size tile of image drawn over background, or None
+        if cells that small are filled with color instead.
+        """
+        if cell_size < MIN_SPRITE_SIZE:
+            return None
+        if cell_size != self.cell_size:
+            self.cell_size = cell_size
+            self.tiles = {}
+        key = image, tuple(background)
+        if key not in self.tiles:
+            self.tiles[key] = self.make_tile(image, cell_size, background)
+        return self.tiles[key]
+
+    def make_tile(self, image, cell_size, background):
+        w, h = image.get_size()
+        size = (max(w * cell_size // ART_CELL_SIZE, 1),
+                    max(h * cell_size // ART_CELL_SIZE, 1))
+        if size != (w, h):
+            image = pg.transform.scale(image, size)
+        tile = pg.Surface((cell_size, cell_size))
+        tile.fill(background)
+        tile.blit(image, (0, 0))
+        return tile.convert()
+
+    def build(self, images, cell_size, background):
+        """Make the tiles of all of images ahead of their first use."""
+        for image in images:
+            self.get(image, cell_size, background)
+
+
+#The cache shared by every world.
+SPRITES = SpriteCache()
@@ -0,0 +1,118 @@
+"""
+The part of a world that is on screen. A Viewport shows a window of the
+world's cells in a rect of the screen at a zoom level (the cell size in
+pixels) and can be panned and zoomed. The ocean is a torus, so the
+window wraps around its edges and, zoomed out far enough, shows the
+ocean repeated side by side.
+
+Worlds only draw the cells in the window, picked out by index ranges
+over their grid, so drawing costs time in proportion to the size of the
+rect on screen rather than the size of the world.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pygame as pg
+
+
+#Cell sizes the viewport zooms between.
+ZOOM_LEVELS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+
+#The visible cells: num_columns columns from first_column and num_rows
+#rows from first_row (wrapping around the world), drawn cell_size pixels
+#apart with the first cell's top left corner at (left, top), which is at
+#or above and left of the viewport rect's top left.
+Window = namedtuple("Window", ["first_column", "first_row", "num_columns",
+                                             "num_rows", "left", "top", "cell_size"])
+
+
+class Viewport(object):
+    """
+    Shows the cells of a num_columns by num_rows world in rect, starting
+    at cell_size pixels per cell with the world's top left cell at the
+    top left of rect. The current Window is kept in window; it is only
+    ever replaced, never changed, so other threads can read it.
+    """
+    def __init__(self, rect, num_columns, num_rows, cell_size):
+        self.rect = pg.Rect(rect)
+        self.num_columns = num_columns
+        self.num_rows = num_rows
+        self.home_size = cell_size
+        self.zoom_levels = sorted(set(ZOOM_LEVELS + (cell_size,)))
+        self.reset()
+
+    def reset(self):
+        """Go back to the starting zoom and position."""
+        self.cell_size = self.home_size
+        #The world pixel, at the current cell size, at rect's top left.
+        self.scroll = 0, 0
+        self.update_window()
+
+    def set_view(self, cell_size, scroll):
+        self.cell_size = cell_size
+        self.scroll = (scroll[0] % (self.num_columns * cell_size),
+                           scroll[1] % (self.num_rows * cell_size))
+        self.update_window()
+
+    def pan(self, dx, dy):
+        """Move the world dx, dy pixels, as if dragged."""
+        self.set_view(self.cell_size, (self.scroll[0] - dx, self.scroll[1] - dy))
+
+    def zoom(self, steps, pos):
+        """
+        Zoom in steps zoom levels (out if steps is negative), keeping the
+        point of the world at screen position pos where it is.
+        """
+        indx = self.zoom_levels.index(self.cell_size) + steps
+        indx = min(max(indx, 0), len(self.zoom_levels) - 1)
+        size = self.zoom_levels[indx]
+        if size == self.cell_size:
+            return
+        x = pos[0] - self.rect.left
+        y = pos[1] - self.rect.top
+        scale = size / float(self.cell_size)
+        self.set_view(size, (int(round((self.scroll[0] + x) * scale)) - x,
+                                   int(round((self.scroll[1] + y) * scale)) - y))
+
+    def update_window(self):
+        size = self.cell_size
+        x, y = self.scroll
+        left = self.rect.left - x % size
+        top = self.rect.top - y % size
+        self.window = Window(x // size, y // size,
+                                        -(-(self.rect.right - left) // size),
+                                        -(-(self.rect.bottom - top) // size),
+                                        left, top, size)
+
+    def whole_world(self, window):
+        """Return True if window shows every cell once, where it lies."""
+        return (window.first_column == 0 and window.first_row == 0 and
+                   window.num_columns == self.num_columns and
+                   window.num_rows == self.num_rows)
+
+    def window_indexes(self, window):
+        """
+        Return arrays of the world columns and rows of the cells in
+        window, in order across and down the screen.
+        """
+        columns = np.arange(window.first_column,
+                                      window.first_column + window.num_columns)
+        rows = np.arange(window.first_row, window.first_row + window.num_rows)
+        return columns % self.num_columns, rows % self.num_rows
+
+    def window_spots(self, window):
+        """
+        Return dicts of the positions in window of every world column and
+        of every world row that is visible, as lists: a column or row is
+        in the window more than once when the world is smaller than it.
+        """
+        columns, rows = self.window_indexes(window)
+        spots = []
+        for indexes in (columns, rows):
+            where = {}
+            for i, indx in enumerate(indexes.tolist()):
+                where.setdefault(indx, []).append(i)
+            spots.append(where)
+        return spots
@@ -1,128 +1,159 @@
-from random import sample, choice, randint
-
 import pygame as pg
 
 from .. import prepare
+from .ocean import Ocean
+from .sprites import SPRITES
+from .viewport import Viewport
+
 
-class WatorWorld(object):
+class WatorWorld(Ocean):
+    """
+    An Ocean that can draw itself. Only the cells in the window of its
+    viewport are drawn.
+    """
     shark_color = prepare.SHARK_COLOR
     fish_color = prepare.FISH_COLOR
     water_color = prepare.WATER_COLOR
-    offsets = [(-1, 0), (0, -1), (1, 0), (0, 1)]
     def __init__(self, setup_dict):
         d = setup_dict
         self.left, self.top = d["topleft"]
-        size = d["size"]
         self.cell_size = d["cell size"]
-        self.num_rows = size[1] // self.cell_size
-        self.num_columns = size[0] // self.cell_size
-        self.width = self.num_columns * self.cell_size
-        self.height = self.num_rows * self.cell_size
-        self.world_rect = pg.Rect((self.left, self.top),
-                                              (self.width, self.height))
-        self.fish_reproduce_age = d["fish reproduce age"]
-        self.shark_reproduce_age = d["shark reproduce age"]
-        self.shark_starve_time = d["shark starve time"]
         self.fish_img = prepare.GFX["fish1"]
         self.shark_img = prepare.GFX["shark1"]
-        self.generate_world(setup_dict)
-        self.ticks = 0
-
-    def get_neighbors(self, index):
-        vacant = []
-        fishes = []
-        neighbors = ((offset[0] + index[0], offset[1] + index[1])
-                            for offset in self.offsets)
-        for dx, dy in neighbors:
-            try:
-                occupant = self.grid[(dx, dy)]
-            except KeyError:
-                if dx > self.num_columns - 1:
-                    dx = 0
-                elif dx < 0:
-                    dx = self.num_columns - 1
-                if dy > self.num_rows - 1:
-                    dy = 0
-                elif dy < 0:
-                    dy = self.num_rows - 1
-                occupant = self.grid[(dx, dy)]
-            if occupant is None:
-                vacant.append((dx, dy))
-            elif occupant[0] == "fish":
-                fishes.append((dx, dy))
-        return vacant, fishes
+        self.render_mode = d["render mode"]
+        super(WatorWorld, self).__init__(setup_dict)
+        self.width = min(d["size"][0], self.num_columns * self.cell_size)
+        self.height = min(d["size"][1], self.num_rows * self.cell_size)
+        self.viewport = Viewport(((self.left, self.top), (self.width, self.height)),
+                                             self.num_columns, self.num_rows, self.cell_size)
+        self.world_rect = self.viewport.rect
+        self.canvas = None
+        self.frame = None
 
-    def generate_world(self, setup_dict):
-        indexes = [(x, y) for x in range(self.num_columns)
-                        for y in range(self.num_rows)]
-        self.grid = {indx_: None for indx_ in indexes}
-        self.lefttops = {indx: (self.left + (indx[0] * self.cell_size),
-                               self.top + (indx[1] * self.cell_size))
-                               for indx in self.grid}
-        fish_spots = sample(indexes, setup_dict["num fish"])
-        open = [x for x in indexes if x not in fish_spots]
-        shark_spots = sample(open, setup_dict["num sharks"])
-        self.fishes = pg.sprite.Group()
-        for f in fish_spots:
-            self.grid[f] = ["fish", 0]
-        for s in shark_spots:
-            self.grid[s] = ["shark", 0, self.shark_starve_time]
+    def capture_frame(self):
+        """
+        Return a copy of what draw needs, a dict of the kind of creature
+        ("fish" or "shark") in each occupied cell. While frame holds one,
+        draw shows it instead of the live grid.
+        """
+        grid = self.grid
+        return {indx: grid[indx][0] for indx in self.occupied_cells()}
 
-    def update(self):
-        self.ticks += 1
-        for cell in self.grid:
-            occupant = self.grid[cell]
-            if occupant is None:
-                continue
-            vacant, fishes = self.get_neighbors(cell)
-            if occupant[0] == "fish":
-                occupant[1] += 1
-                if vacant:
-                    new_spot = choice(vacant)
-                    self.grid[new_spot] = self.grid[cell]
-                    if occupant[1] >= self.fish_reproduce_age:
-                        self.grid[new_spot][1] = 0
-                        self.grid[cell] = ["fish", 0]
-                    else:
-                        self.grid[cell] = None
+    def frame_kinds(self):
+        """Return the dict of occupied cells and their kinds to draw."""
+        if self.frame is not None:
+            return self.frame
+        return self.capture_frame()
 
-            elif occupant[0] == "shark":
-                occupant[1] += 1
-                occupant[2] -= 1
-                if occupant[2] <= 0:
-                    self.grid[cell] = None
-                else:
-                    if fishes:
-                        dest = choice(fishes)
-                        self.grid[cell][2] = self.shark_starve_time
-                        self.move_shark(cell, dest)
-                    elif vacant:
-                        dest = choice(vacant)
-                        self.move_shark(cell, dest)
-        
-    def add_fish(self):
-        indx = randint(0, self.num_columns - 1), randint(0, self.num_rows - 1)
-        self.grid[indx] = ["fish", 0]
-             
-    def add_shark(self):
-        indx = randint(0, self.num_columns - 1), randint(0, self.num_rows - 1)
-        self.grid[indx] = ["shark", 0, self.shark_starve_time]
-                
-    def move_shark(self, cell, dest):
-        self.grid[dest] = self.grid[cell]
-        if self.grid[dest][1] >= self.shark_reproduce_age:
-            self.grid[cell] = ["shark", 0, self.shark_starve_time]
-            self.grid[dest][1] = 0
+    def window_kinds(self, window):
+        """
+        Return a dict of the kind of creature in each occupied cell of
+        window, keyed by the cell's (column, row) in the window. Whichever
+        is smaller of the window and the occupied cells is searched, so
+        the cost never grows past the size of the window.
+        """
+        kinds = self.frame_kinds()
+        if self.viewport.whole_world(window):
+            return kinds
+        visible = {}
+        if len(kinds) < window.num_columns * window.num_rows:
+            column_spots, row_spots = self.viewport.window_spots(window)
+            for (x, y), kind in kinds.items():
+                if x in column_spots and y in row_spots:
+                    for i in column_spots[x]:
+                        for j in row_spots[y]:
+                            visible[i, j] = kind
         else:
-            self.grid[cell] = None
+            columns, rows = self.viewport.window_indexes(window)
+            rows = list(enumerate(rows.tolist()))
+            for i, x in enumerate(columns.tolist()):
+                for j, y in rows:
+                    kind = kinds.get((x, y))
+                    if kind:
+                        visible[i, j] = kind
+        return visible
+
+    def creature_images(self, cell_size):
+        """
+        Return a dict of the tile to draw each kind of creature with at
+        cell_size, or of None where cells are too small for images and
+        are filled with the creature's color.
+        """
+        water = self.water_color
+        return {"fish": SPRITES.get(self.fish_img, cell_size, water),
+                   "shark": SPRITES.get(self.shark_img, cell_size, water)}
 
     def draw(self, surface):
-        surface.fill(self.water_color, self.world_rect)
-        for indx, val in self.grid.items():
-            if val is None:
-                continue
-            if val[0] == "fish":
-                surface.blit(self.fish_img, self.lefttops[indx])
+        """
+        Draw the world using the current render mode. Returns a list of
+        the screen rects that changed, or None if the whole world may
+        have changed.
+        """
+        window = self.viewport.window
+        if self.render_mode == "dirty":
+            return self.draw_dirty(surface, window)
+        self.draw_full(surface, window)
+
+    def blit_window(self, surface, image, window):
+        """Blit an image of window's cells, cut to the viewport's rect."""
+        area = self.world_rect.move(-window.left, -window.top)
+        surface.blit(image, self.world_rect, area)
+
+    def draw_dirty(self, surface, window):
+        """
+        Redraw only the cells whose occupant changed since the last frame
+        onto a persistent canvas of the window, then blit the canvas to
+        surface. Moving the viewport redraws the whole canvas.
+        """
+        left, top, size = window.left, window.top, window.cell_size
+        images = self.creature_images(size)
+        colors = {"fish": self.fish_color, "shark": self.shark_color}
+        redraw_all = (self.canvas is None or images != self.canvas_images or
+                            window != self.canvas_window)
+        if redraw_all:
+            canvas_size = window.num_columns * size, window.num_rows * size
+            if self.canvas is None or self.canvas.get_size() != canvas_size:
+                self.canvas = pg.Surface(canvas_size).convert()
+            self.canvas.fill(self.water_color)
+            self.canvas_images = images
+            self.canvas_window = window
+            self.drawn = {}
+        drawn = self.drawn
+        kinds = self.window_kinds(window)
+        #Only cells occupied now or when last drawn can have changed.
+        changed = [indx for indx, kind in drawn.items() if kinds.get(indx) != kind]
+        changed.extend(indx for indx in kinds if indx not in drawn)
+        rects = []
+        for indx in changed:
+            rect = pg.Rect(indx[0] * size, indx[1] * size, size, size)
+            kind = kinds.get(indx)
+            if kind and images[kind] is None:
+                self.canvas.fill(colors[kind], rect)
+                drawn[indx] = kind
+            elif kind:
+                self.canvas.blit(images[kind], rect)
+                drawn[indx] = kind
             else:
-                surface.blit(self.shark_img, self.lefttops[indx])
+                self.canvas.fill(self.water_color, rect)
+                del drawn[indx]
+            rects.append(rect.move(left, top))
+        self.blit_window(surface, self.canvas, window)
+        num_cells = window.num_columns * window.num_rows
+        if redraw_all or len(rects) > num_cells // 4:
+            return [self.world_rect.copy()]
+        return rects
 
+    def draw_full(self, surface, window):
+        surface.fill(self.water_color, self.world_rect)
+        clip = surface.get_clip()
+        surface.set_clip(self.world_rect)
+        left, top, size = window.left, window.top, window.cell_size
+        images = self.creature_images(size)
+        colors = {"fish": self.fish_color, "shark": self.shark_color}
+        for (x, y), kind in self.window_kinds(window).items():
+            pos = left + x * size, top + y * size
+            if images[kind] is None:
+                surface.fill(colors[kind], (pos, (size, size)))
+            else:
+                surface.blit(images[kind], pos)
+        surface.set_clip(clip)
@@ -0,0 +1,141 @@
+"""
+Run Wa-Tor simulations without a display. This module and the simulation
+cores it uses never import pygame or load assets, so it starts quickly
+and works on machines with no display.
+"""
+
+import argparse
+import csv
+import json
+import sys
+
+from .components.ocean import Ocean
+from .components.array_ocean import ArrayOcean
+from .components.partitioned_ocean import PartitionedOcean
+from .components import snapshot
+from .components.recording import Recorder
+
+
+ENGINES = {
+        "dict": Ocean,
+        "array": ArrayOcean,
+        "partitioned": PartitionedOcean}
+
+#Same simulation settings as the SimSetup defaults, with the grid given
+#in cells rather than pixels.
+DEFAULT_PARAMS = {
+        "columns": 120,
+        "rows": 64,
+        "engine": "dict",
+        "update mode": "random",
+        "workers": None,
+        "strips": None,
+        "num fish": 7000,
+        "num sharks": 1,
+        "fish reproduce age": 2,
+        "shark reproduce age": 3,
+        "shark starve time": 2,
+        "seed": None,
+        "placement": "uniform",
+        "fish density": None,
+        "shark density": None,
+        "cluster count": 12,
+        "cluster radius": 6,
+        "stripe width": 8,
+        "mask": None}
+
+
+def make_params(overrides=None):
+    """Return DEFAULT_PARAMS updated with overrides."""
+    params = dict(DEFAULT_PARAMS)
+    if overrides:
+        params.update(overrides)
+    return params
+
+
+def run(params, num_ticks, ocean=None, recorder=None):
+    """
+    Run a simulation for num_ticks ticks and return its population series
+    as a list of (tick, num_fish, num_sharks) tuples, starting with the
+    current tick. A new ocean is made from params unless one is passed.
+    If a recording.Recorder is passed every tick is recorded with it.
+    """
+    made = ocean is None
+    if made:
+        ocean = ENGINES[params["engine"]](params)
+    series = [(ocean.ticks, ocean.num_fish, ocean.num_sharks)]
+    for _ in range(num_ticks):
+        ocean.update()
+        if recorder is not None:
+            recorder.record(ocean)
+        series.append((ocean.ticks, ocean.num_fish, ocean.num_sharks))
+    if made and hasattr(ocean, "close"):
+        ocean.close()
+    return series
+
+
+def write_series(series, outfile):
+    writer = csv.writer(outfile)
+    writer.writerow(["tick", "fish", "sharks"])
+    writer.writerows(series)
+
+
+def parse_setting(text):
+    """Parse a "key=value" override, decoding value as JSON if possible."""
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError("expected KEY=VALUE, got {}".format(text))
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return key.strip(), value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            description="Run Wa-Tor without a display and write the "
+                             "population series as CSV.")
+    parser.add_argument("-n", "--ticks", type=int, default=1000,
+                                  help="number of ticks to run (default 1000)")
+    parser.add_argument("-p", "--params",
+                                  help="JSON file of setup params")
+    parser.add_argument("-s", "--set", type=parse_setting, action="append",
+                                  default=[], metavar="KEY=VALUE",
+                                  help="override a single param, e.g. \"num fish=500\"")
+    parser.add_argument("-o", "--output", default="-",
+                                  help="CSV file to write (default stdout)")
+    parser.add_argument("--load",
+                                  help="snapshot to continue from instead of a new ocean")
+    parser.add_argument("--save",
+                                  help="write a snapshot of the final state to this file")
+    parser.add_argument("--record",
+                                  help="write a tick log of the run to this file")
+    parser.add_argument("--keyframe-interval", type=int, default=100,
+                                  help="ticks between full frames in the tick log "
+                                          "(default 100)")
+    args = parser.parse_args(argv)
+    overrides = {}
+    if args.params:
+        with open(args.params) as f:
+            overrides.update(json.load(f))
+    overrides.update(args.set)
+    params = make_params(overrides)
+    if args.load:
+        ocean = snapshot.load(args.load, ENGINES[params["engine"]], params)
+    else:
+        ocean = ENGINES[params["engine"]](params)
+    recorder = None
+    if args.record:
+        recorder = Recorder(ocean, args.record, args.keyframe_interval)
+    series = run(params, args.ticks, ocean, recorder)
+    if recorder is not None:
+        recorder.close()
+    if args.save:
+        snapshot.save(ocean, args.save)
+    if args.output == "-":
+        write_series(series, sys.stdout)
+    else:
+        with open(args.output, "w") as f:
+            write_series(series, f)
+    return 0
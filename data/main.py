@@ -1,10 +1,11 @@
 from . import prepare,tools
-from .states import title_screen, sim_setup, gameplay
+from .states import title_screen, sim_setup, gameplay, replay
 
 def main():
     controller = tools.Control(prepare.ORIGINAL_CAPTION)
     states = {"TITLE": title_screen.TitleScreen(),
                    "SIM_SETUP": sim_setup.SimSetup(),
-                   "GAMEPLAY": gameplay.Gameplay()}
+                   "GAMEPLAY": gameplay.Gameplay(),
+                   "REPLAY": replay.Replay()}
     controller.setup_states(states, "TITLE")
     controller.main()
@@ -21,6 +21,7 @@ LIGHT_WATER = 32, 70, 96
 
 FONTS = tools.load_all_fonts(os.path.join("resources", "fonts"))
 MUSIC = tools.load_all_music(os.path.join("resources", "music"))
-SFX   = tools.load_all_sfx(os.path.join("resources", "sound"))
-GFX   = tools.load_all_gfx(os.path.join("resources", "graphics"))
-GFX["arrow-right"] = pg.transform.flip(GFX["arrow-left"], True, False)
\ No newline at end of file
+#Sounds and graphics are loaded the first time they're used.
+SFX   = tools.lazy_sfx(os.path.join("resources", "sound"))
+GFX   = tools.lazy_gfx(os.path.join("resources", "graphics"))
+GFX.add("arrow-right", lambda: pg.transform.flip(GFX["arrow-left"], True, False))
\ No newline at end of file
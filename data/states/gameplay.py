@@ -1,9 +1,28 @@
+import glob
+import os
+
 import pygame as pg
 
 from .. import tools, prepare
-from ..components.labels import Label, Button, ButtonGroup
+from ..components.labels import Label, GlyphLabel, Button, ButtonGroup
 from ..components.world import WatorWorld
+from ..components.array_world import ArrayWorld, PartitionedWorld
 from ..components.graph import Graph
+from ..components.history import History
+from ..components import snapshot
+from ..components.recording import Recorder
+from ..components.profiler import PROFILER
+from ..components.sim_thread import SimThread
+from ..components.sprites import SPRITES
+
+
+WORLD_ENGINES = {
+        "dict": WatorWorld,
+        "array": ArrayWorld,
+        "partitioned": PartitionedWorld}
+
+SNAPSHOT_DIR = "snapshots"
+RECORDING_DIR = "recordings"
 
 
 class Slider(object):
@@ -80,28 +99,38 @@ class FrameRect(object):
 class Gameplay(tools._State):
     def __init__(self):
         super(Gameplay, self).__init__()
+        #A tick length of 0 runs the simulation as fast as it can.
         self.tick_length = 200
-        self.timer = 0
         self.bg_color = prepare.LIGHT_WATER
         self.frame_color = 167, 190, 206
         self.paused = False
-        self.tick_lengths = [60, 70, 80, 90, 100, 120, 200, 300,
+        self.turbo = False
+        self.tick_lengths = [0, 60, 70, 80, 90, 100, 120, 200, 300,
                                      400, 500, 1000, 2000, 5000]
-        self.tick_index = 5
+        self.tick_index = 6
         self.dark_bg = (18, 38, 53)
 
     def startup(self, persistent):
         self.persist = persistent
         PARAMS = self.persist["PARAMS"]
-        self.world_rect = pg.Rect(PARAMS["topleft"], PARAMS["size"])
-        self.frame_rect = FrameRect(self.world_rect)
-        self.world = WatorWorld(PARAMS)
+        #Coming back from Replay carries on with the same world.
+        self.world = self.persist.pop("world", None)
+        if self.world is None:
+            self.world = WORLD_ENGINES[PARAMS["engine"]](PARAMS)
+        self.frame_world()
         self.graph_frame = FrameRect(pg.Rect((176, 548), (960, 96)))
         self.graph = Graph((176, 548), (960, 96))
         self.icon_rect = pg.Rect(16, 16, 136, 100)
         self.icon_frame = FrameRect(self.icon_rect)
-        self.reports = {"fish": [PARAMS["num fish"]],
-                              "shark": [PARAMS["num sharks"]]}
+        self.history = self.persist.pop("history", None)
+        if self.history is None:
+            self.reset_history()
+        self.graph_version = None
+        self.recorder = None
+        self.recording = False
+        self.show_whole_run = False
+        self.redraw_all = True
+        self.drag_pos = None
         self.labels = pg.sprite.Group()
 
         self.make_icon_buttons()
@@ -113,22 +142,57 @@ class Gameplay(tools._State):
                    call=self.pause_sim, bindings=[pg.K_SPACE])
         self.make_add_buttons()
         self.make_adjusters()
+        self.record_label = Label("", {"midtop": (self.icon_rect.centerx, 600)},
+                                            self.labels, text_color=prepare.SHARK_COLOR)
+        self.rate_label = GlyphLabel("", {"midtop": (self.icon_rect.centerx, 236)},
+                                                  self.labels)
+        self.rate_ticks = 0
+        self.rate_timer = 0
+        self.populations = self.world.num_fish, self.world.num_sharks
+        self.start_sim()
+
+    def frame_world(self):
+        """
+        Fit the frame and the side panel to the world's rect, which
+        depends on the world's dimensions.
+        """
+        self.world_rect = self.world.world_rect.copy()
+        self.frame_rect = FrameRect(self.world_rect)
+        self.panel_rect = pg.Rect(0, 0, self.frame_rect.rect.left,
+                                             prepare.SCREEN_RECT.height)
+
+    def start_sim(self):
+        self.sim = SimThread(self.world, self.tick_length, self.record_tick)
+        self.sim.set_paused(self.paused)
+        self.sim.start()
+
+    def stop_sim(self):
+        """Stop the sim thread, closing any recording first."""
+        self.stop_recording()
+        self.sim.stop()
+
+    def cleanup(self):
+        self.stop_sim()
+        self.persist["world"] = self.world
+        self.persist["history"] = self.history
+        self.done = False
+        return self.persist
 
     def make_add_buttons(self):
-        num_fish = self.persist["PARAMS"]["num fish"]
-        num_sharks = self.persist["PARAMS"]["num sharks"]
+        num_fish = self.world.num_fish
+        num_sharks = self.world.num_sharks
         f_img = prepare.GFX["fish_button"]
         s_img = prepare.GFX["shark_button"]
         w, h = f_img.get_size()
         cx = self.icon_rect.centerx
         offset = 10
         top = 500
-        self.fish_label = Label("{} Fish".format(num_fish),
-                                        {"topright": (cx - offset, top)},
-                                        self.labels, text_color=prepare.FISH_COLOR)
-        self.shark_label = Label("{} Shark".format(num_sharks),
-                                           {"topleft": (cx + offset, top)},
-                                           self.labels, text_color=prepare.SHARK_COLOR)
+        self.fish_label = GlyphLabel("{} Fish".format(num_fish),
+                                                {"topright": (cx - offset, top)},
+                                                self.labels, text_color=prepare.FISH_COLOR)
+        self.shark_label = GlyphLabel("{} Shark".format(num_sharks),
+                                                   {"topleft": (cx + offset, top)},
+                                                   self.labels, text_color=prepare.SHARK_COLOR)
         Button((cx - (offset + w), top + 20), self.icons, button_size=(w, h),
                    idle_image=f_img, call=self.add_fish)
         Button((cx + offset, top + 20), self.icons, button_size=(w, h),
@@ -162,10 +226,10 @@ class Gameplay(tools._State):
                    call=self.adjust_shark_starve_time, args=1, **style)
 
     def add_fish(self, *args):
-        self.world.add_fish()
+        self.sim.call(self.world.add_fish)
 
     def add_shark(self, *args):
-        self.world.add_shark()
+        self.sim.call(self.world.add_shark)
 
     def adjust_fish_reproduce_age(self, amount):
         self.world.fish_reproduce_age += amount
@@ -188,8 +252,28 @@ class Gameplay(tools._State):
         text = "{}".format(self.world.shark_starve_time)
         self.shark_starve_label.set_text(text)
 
+    def toggle_turbo(self):
+        """Run as many ticks as fit between frames, ignoring the slider."""
+        self.turbo = not self.turbo
+        self.rate_ticks = 0
+        self.rate_timer = 0
+
+    def update_rate(self, dt, ticks):
+        """Show the achieved ticks per second, averaged over half a second."""
+        self.rate_ticks += ticks
+        self.rate_timer += dt
+        if self.rate_timer >= 500:
+            rate = self.rate_ticks * 1000. / self.rate_timer
+            text = "{:.0f} ticks/s".format(rate)
+            if self.turbo:
+                text = "Turbo - " + text
+            self.rate_label.set_text(text)
+            self.rate_ticks = 0
+            self.rate_timer = 0
+
     def pause_sim(self, *args):
         self.paused = not self.paused
+        self.sim.set_paused(self.paused)
 
     def make_slider(self):
         self.speed_slider = Slider((self.icon_rect.centerx, 150),
@@ -204,6 +288,10 @@ class Gameplay(tools._State):
         self.icons = ButtonGroup()
         shark_imgs = [prepare.GFX["shark{}".format(x)] for x in range(1, 16)]
         fish_imgs = [prepare.GFX["fish{}".format(x)] for x in range(1, 16)]
+        #Scale every selectable image for the world's cell size up front so
+        #picking one never stalls a frame.
+        SPRITES.build(shark_imgs + fish_imgs, self.world.cell_size,
+                          self.world.water_color)
         Label("Shark Image",
                 {"midtop": (self.icon_rect.centerx, self.icon_rect.top)},
                 self.labels)
@@ -245,46 +333,185 @@ class Gameplay(tools._State):
 
     def get_event(self,event):
         if event.type == pg.QUIT:
+            self.stop_sim()
             self.quit = True
         elif event.type == pg.KEYUP:
             if event.key == pg.K_ESCAPE:
+                self.stop_sim()
                 self.quit = True
+            elif event.key == pg.K_h:
+                self.toggle_graph_view()
+            elif event.key == pg.K_F2:
+                self.sim.call(self.save_snapshot)
+            elif event.key == pg.K_F3:
+                self.load_snapshot()
+            elif event.key == pg.K_r:
+                self.toggle_recording()
+            elif event.key == pg.K_p:
+                self.start_replay()
+            elif event.key == pg.K_t:
+                self.toggle_turbo()
+            elif event.key == pg.K_HOME:
+                self.world.viewport.reset()
+                self.sim.request_frame(True)
+        elif event.type == pg.MOUSEBUTTONDOWN:
+            self.view_event(event)
+        elif event.type == pg.MOUSEMOTION and self.drag_pos is not None:
+            self.world.viewport.pan(event.pos[0] - self.drag_pos[0],
+                                              event.pos[1] - self.drag_pos[1])
+            self.drag_pos = event.pos
+            self.sim.request_frame(True)
+        elif event.type == pg.MOUSEBUTTONUP and event.button == 1:
+            self.drag_pos = None
+            if self.graph.rect.collidepoint(event.pos):
+                self.toggle_graph_view()
         self.icons.get_event(event)
         self.adjusters.get_event(event)
         self.speed_slider.get_event(event)
 
-    def report(self):
-        num_sharks = len([x for x in self.world.grid.values()
-                                    if x is not None and x[0] == "shark"])
-        num_fish = len([x for x in self.world.grid.values()
-                                if x is not None and x[0] == "fish"])
-        self.reports["fish"].append(num_fish)
-        self.reports["shark"].append(num_sharks)
-        num = len(self.reports["fish"])
-        if num > 2000:
-            self.reports["fish"] = self.reports["fish"][num-2000:]
-            self.reports["shark"] = self.reports["shark"][num-2000:]
-        return num_fish, num_sharks
+    def view_event(self, event):
+        """Zoom the world view with the mouse wheel and pan it by dragging."""
+        viewport = self.world.viewport
+        if not viewport.rect.collidepoint(event.pos):
+            return
+        if event.button == 1:
+            self.drag_pos = event.pos
+        elif event.button == 4:
+            viewport.zoom(1, event.pos)
+            self.sim.request_frame(True)
+        elif event.button == 5:
+            viewport.zoom(-1, event.pos)
+            self.sim.request_frame(True)
+
+    def reset_history(self):
+        self.history = History(("fish", "shark"), 2000)
+        self.history.append({"fish": self.world.num_fish,
+                                     "shark": self.world.num_sharks})
+        self.graph_version = None
+
+    def save_snapshot(self):
+        """
+        Save the world to SNAPSHOT_DIR, named by its seed and tick. Runs on
+        the sim thread.
+        """
+        if not os.path.isdir(SNAPSHOT_DIR):
+            os.makedirs(SNAPSHOT_DIR)
+        name = "wator-{}-{:08d}.wator".format(self.world.seed, self.world.ticks)
+        snapshot.save(self.world, os.path.join(SNAPSHOT_DIR, name))
+
+    def load_snapshot(self):
+        """Replace the world with the most recently saved snapshot."""
+        #Stopping the sim thread first finishes any save still queued.
+        self.stop_sim()
+        paths = glob.glob(os.path.join(SNAPSHOT_DIR, "*.wator"))
+        if not paths:
+            self.start_sim()
+            return
+        path = max(paths, key=os.path.getmtime)
+        PARAMS = self.persist["PARAMS"]
+        try:
+            world = snapshot.load(path, WORLD_ENGINES[PARAMS["engine"]], PARAMS)
+        except (EnvironmentError, ValueError, KeyError):
+            #Carry on with the current world if the snapshot can't be read.
+            self.start_sim()
+            return
+        world.fish_img = self.world.fish_img
+        world.shark_img = self.world.shark_img
+        self.world = world
+        self.frame_world()
+        self.drag_pos = None
+        self.reset_history()
+        self.start_sim()
+        self.fish_repro_label.set_text("{}".format(world.fish_reproduce_age))
+        self.shark_repro_label.set_text("{}".format(world.shark_reproduce_age))
+        self.shark_starve_label.set_text("{}".format(world.shark_starve_time))
+        self.redraw_all = True
+
+    def toggle_recording(self):
+        """Start or stop writing a tick log to RECORDING_DIR."""
+        if self.recording:
+            self.stop_recording()
+            return
+        self.recording = True
+        self.sim.call(self.open_recorder)
+        self.record_label.set_text("Recording")
+
+    def stop_recording(self):
+        if self.recording:
+            self.recording = False
+            self.sim.call(self.close_recorder)
+            self.record_label.set_text("")
+
+    def open_recorder(self):
+        """Start a tick log of the world. Runs on the sim thread."""
+        if not os.path.isdir(RECORDING_DIR):
+            os.makedirs(RECORDING_DIR)
+        name = "wator-{}-{:08d}.watorlog".format(self.world.seed, self.world.ticks)
+        self.recorder = Recorder(self.world, os.path.join(RECORDING_DIR, name))
+
+    def close_recorder(self):
+        self.recorder.close()
+        self.recorder = None
+
+    def record_tick(self, world):
+        """Called by the sim thread after every tick."""
+        if self.recorder is not None:
+            self.recorder.record(world)
+
+    def start_replay(self):
+        """Play back the most recent tick log in the Replay state."""
+        self.stop_recording()
+        paths = glob.glob(os.path.join(RECORDING_DIR, "*.watorlog"))
+        if not paths:
+            return
+        self.persist["recording"] = max(paths, key=os.path.getmtime)
+        self.next = "REPLAY"
+        self.done = True
+
+    def toggle_graph_view(self):
+        """Switch the graph between the last 2000 ticks and the whole run."""
+        self.show_whole_run = not self.show_whole_run
+        self.graph_version = None
+
+    def report(self, num_fish, num_sharks):
+        self.history.append({"fish": num_fish, "shark": num_sharks})
 
     def update(self, dt):
         mouse_pos = pg.mouse.get_pos()
         self.icons.update(mouse_pos)
         self.adjusters.update(mouse_pos)
         self.speed_slider.update(mouse_pos, self)
-        if not self.paused:
-            self.timer += dt
-            while self.timer >= self.tick_length:
-                self.timer -= self.tick_length
-                self.world.update()
-                num_fish, num_sharks = self.report()
-                self.fish_label.set_text("{} Fish".format(num_fish))
-                self.shark_label.set_text("{} Sharks".format(num_sharks))
-        data_lines = [
-                [self.world.fish_color, self.reports["fish"]],
-                [self.world.shark_color, self.reports["shark"]]]
-        self.graph.make_lines(data_lines)
+        self.sim.set_tick_length(0 if self.turbo else self.tick_length)
+        reports = self.sim.take_reports()
+        for num_fish, num_sharks, seconds in reports:
+            PROFILER.add("sim tick", seconds)
+            self.report(num_fish, num_sharks)
+        self.update_rate(dt, len(reports))
+        if self.sim.populations != self.populations:
+            self.populations = num_fish, num_sharks = self.sim.populations
+            self.fish_label.set_text("{} Fish".format(num_fish))
+            self.shark_label.set_text("{} Sharks".format(num_sharks))
+        self.sim.request_frame()
+        if self.history.version != self.graph_version:
+            whole_run = self.show_whole_run
+            data_lines = [
+                    [self.world.fish_color,
+                     self.history.series("fish", whole_run)],
+                    [self.world.shark_color,
+                     self.history.series("shark", whole_run)]]
+            with PROFILER.phase("make_lines"):
+                self.graph.make_lines(data_lines)
+            self.graph_version = self.history.version
+
+    def invalidate(self):
+        self.redraw_all = True
 
     def draw(self, surface):
+        """
+        Draw everything. When the world is drawn with dirty rects only the
+        side panel, the graph and the world cells that changed are
+        returned for the display update.
+        """
         surface.fill(self.bg_color)
         pg.draw.rect(surface, self.dark_bg, self.icon_rect)
         self.icons.draw(surface)
@@ -293,7 +520,13 @@ class Gameplay(tools._State):
         self.adjusters.draw(surface)
         self.slider_frame.draw(surface)
         self.icon_frame.draw(surface)
-        self.world.draw(surface)
-        self.graph.draw(surface)
+        with PROFILER.phase("world.draw"):
+            world_rects = self.world.draw(surface)
+        with PROFILER.phase("graph.draw"):
+            self.graph.draw(surface)
         self.frame_rect.draw(surface)
         self.graph_frame.draw(surface)
+        if world_rects is None or self.redraw_all:
+            self.redraw_all = False
+            return None
+        return [self.panel_rect, self.graph_frame.rect] + world_rects
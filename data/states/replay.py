@@ -0,0 +1,166 @@
+import pygame as pg
+
+from .. import tools, prepare
+from ..components.labels import Label, GlyphLabel
+from ..components.array_world import ArrayWorld
+from ..components.graph import Graph
+from ..components.history import Decimator
+from ..components.recording import Player
+from .gameplay import FrameRect
+
+
+class Replay(tools._State):
+    """
+    Plays back a tick log recorded in Gameplay. Playback runs forwards or
+    backwards at any of the rates in self.rates (ticks per second) and
+    clicking the graph seeks to that point of the recording.
+    """
+    def __init__(self):
+        super(Replay, self).__init__()
+        self.bg_color = prepare.LIGHT_WATER
+        self.dark_bg = (18, 38, 53)
+        self.rates = [-480, -120, -30, -10, -5, 5, 10, 30, 120, 480]
+
+    def startup(self, persistent):
+        self.persist = persistent
+        PARAMS = self.persist["PARAMS"]
+        self.player = Player(self.persist["recording"])
+        params = dict(PARAMS)
+        params.update({
+                "engine": "array",
+                "columns": self.player.num_columns,
+                "rows": self.player.num_rows,
+                "num fish": 0,
+                "num sharks": 0,
+                "fish density": None,
+                "shark density": None,
+                "placement": "uniform"})
+        self.world = ArrayWorld(params)
+        self.world.species = self.player.species
+        gameplay_world = self.persist.get("world")
+        if gameplay_world is not None:
+            self.world.fish_img = gameplay_world.fish_img
+            self.world.shark_img = gameplay_world.shark_img
+        self.frame_rect = FrameRect(self.world.world_rect)
+        self.graph_frame = FrameRect(pg.Rect((176, 548), (960, 96)))
+        self.graph = Graph((176, 548), (960, 96))
+        self.make_graph_lines()
+        self.panel_rect = pg.Rect(0, 0, self.frame_rect.rect.left,
+                                             prepare.SCREEN_RECT.height)
+        self.rate_index = self.rates.index(10)
+        self.paused = False
+        self.play_tick = float(self.player.first_tick)
+        self.make_labels()
+        self.redraw_all = True
+
+    def cleanup(self):
+        self.player.close()
+        self.done = False
+        return self.persist
+
+    def make_graph_lines(self):
+        fish = Decimator(1024)
+        sharks = Decimator(1024)
+        for num_fish, num_sharks in zip(self.player.fish_counts,
+                                                         self.player.shark_counts):
+            fish.append(num_fish)
+            sharks.append(num_sharks)
+        self.graph.make_lines([[self.world.fish_color, fish],
+                                         [self.world.shark_color, sharks]])
+
+    def make_labels(self):
+        self.labels = pg.sprite.Group()
+        cx = self.panel_rect.centerx
+        Label("Replay", {"midtop": (cx, 16)}, self.labels, font_size=24)
+        self.tick_label = GlyphLabel("", {"midtop": (cx, 60)}, self.labels)
+        self.rate_label = GlyphLabel("", {"midtop": (cx, 80)}, self.labels)
+        self.fish_label = GlyphLabel("", {"midtop": (cx, 120)}, self.labels,
+                                                text_color=prepare.FISH_COLOR)
+        self.shark_label = GlyphLabel("", {"midtop": (cx, 140)}, self.labels,
+                                                   text_color=prepare.SHARK_COLOR)
+        controls = ["SPACE - pause", "UP/DOWN - speed", "LEFT/RIGHT - step",
+                         "HOME/END - jump", "click graph - seek", "ESC - back"]
+        for i, text in enumerate(controls):
+            Label(text, {"midtop": (cx, 400 + i * 20)}, self.labels)
+        self.update_labels()
+
+    def update_labels(self):
+        player = self.player
+        self.tick_label.set_text("Tick {} / {}".format(player.tick, player.last_tick))
+        rate = "Paused" if self.paused else "{} ticks/s".format(self.rates[self.rate_index])
+        self.rate_label.set_text(rate)
+        self.fish_label.set_text("{} Fish".format(player.num_fish))
+        self.shark_label.set_text("{} Sharks".format(player.num_sharks))
+
+    def seek(self, tick):
+        tick = min(max(tick, self.player.first_tick), self.player.last_tick)
+        self.play_tick = float(tick)
+        self.player.seek(tick)
+        self.update_labels()
+
+    def change_rate(self, direction):
+        indx = self.rate_index + direction
+        self.rate_index = min(max(indx, 0), len(self.rates) - 1)
+        self.update_labels()
+
+    def get_event(self, event):
+        if event.type == pg.QUIT:
+            self.quit = True
+        elif event.type == pg.KEYUP:
+            if event.key == pg.K_ESCAPE:
+                self.next = "GAMEPLAY"
+                self.done = True
+            elif event.key == pg.K_SPACE:
+                self.paused = not self.paused
+                self.update_labels()
+            elif event.key == pg.K_UP:
+                self.change_rate(1)
+            elif event.key == pg.K_DOWN:
+                self.change_rate(-1)
+            elif event.key == pg.K_LEFT:
+                self.seek(self.player.tick - 1)
+            elif event.key == pg.K_RIGHT:
+                self.seek(self.player.tick + 1)
+            elif event.key == pg.K_HOME:
+                self.seek(self.player.first_tick)
+            elif event.key == pg.K_END:
+                self.seek(self.player.last_tick)
+        elif event.type == pg.MOUSEBUTTONUP and event.button == 1:
+            if self.graph.rect.collidepoint(event.pos):
+                span = self.player.last_tick - self.player.first_tick
+                fraction = (event.pos[0] - self.graph.rect.left) / float(self.graph.rect.width)
+                self.seek(self.player.first_tick + int(round(fraction * span)))
+
+    def update(self, dt):
+        if self.paused:
+            return
+        self.play_tick += self.rates[self.rate_index] * dt / 1000.
+        if not self.player.first_tick <= self.play_tick <= self.player.last_tick:
+            self.paused = True
+        tick = int(self.play_tick)
+        if tick != self.player.tick or self.paused:
+            self.seek(tick)
+
+    def invalidate(self):
+        self.redraw_all = True
+
+    def draw_cursor(self, surface):
+        span = max(self.player.last_tick - self.player.first_tick, 1)
+        fraction = (self.player.tick - self.player.first_tick) / float(span)
+        x = self.graph.rect.left + int(fraction * (self.graph.rect.width - 1))
+        pg.draw.line(surface, pg.Color("white"),
+                           (x, self.graph.rect.top), (x, self.graph.rect.bottom - 1))
+
+    def draw(self, surface):
+        surface.fill(self.bg_color)
+        pg.draw.rect(surface, self.dark_bg, self.panel_rect.inflate(-16, -16))
+        self.labels.draw(surface)
+        world_rects = self.world.draw(surface)
+        self.graph.draw(surface)
+        self.draw_cursor(surface)
+        self.frame_rect.draw(surface)
+        self.graph_frame.draw(surface)
+        if world_rects is None or self.redraw_all:
+            self.redraw_all = False
+            return None
+        return [self.panel_rect, self.graph_frame.rect] + world_rects
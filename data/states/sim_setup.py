@@ -115,11 +115,24 @@ class SimSetup(tools._State):
                 "topleft": (176, 16),
                 "size": (960, 512),
                 "cell size": 8,
+                "engine": "dict",
+                "update mode": "random",
+                "workers": None,
+                "strips": None,
+                "render mode": "dirty",
                 "num fish": 7000,
                 "num sharks": 1,
                 "fish reproduce age": 2,
                 "shark reproduce age": 3,
-                "shark starve time": 2
+                "shark starve time": 2,
+                "seed": None,
+                "placement": "uniform",
+                "fish density": None,
+                "shark density": None,
+                "cluster count": 12,
+                "cluster radius": 6,
+                "stripe width": 8,
+                "mask": None
                 }
         settings = [("num fish", 0, 7680),
                          ("num sharks", 0, 7680),
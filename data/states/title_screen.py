@@ -1,3 +1,4 @@
+import numpy as np
 import pygame as pg
 
 from .. import tools, prepare
@@ -5,6 +6,15 @@ from ..components.labels import Label
 from ..components.animation import Animation
 
 
+#Grid cell values. Water values are even and the fish value for each
+#is one more.
+WATER = 0
+FISH = 1
+TITLE_WATER = 2
+TITLE_FISH = 3
+TITLE = 4
+
+
 class Fish(pg.sprite.Sprite):
     def __init__(self, midleft):
         self.image = prepare.GFX["pixel-fish"]
@@ -13,16 +23,9 @@ class Fish(pg.sprite.Sprite):
 
     def update(self, grid):
         self.rect.left -= 16
-        try:
-            x = (self.rect.right // 16) + 1
-            y = self.rect.centery // 16
-            cell = grid[(x, y)]
-            if "title" in cell.value:
-                cell.value = "title-fish"
-            else:
-                cell.value = "fish"
-        except KeyError:
-            pass
+        x = (self.rect.right // grid.cell_size) + 1
+        y = self.rect.centery // grid.cell_size
+        grid.add_fish(x, y)
 
     def draw(self, surface):
         surface.blit(self.image, self.rect)
@@ -35,68 +38,115 @@ class Shark(pg.sprite.Sprite):
 
     def update(self, grid):
         self.rect.left -= 16
-        for cell in grid:
-            if grid[cell].value in ("title-water", "title-fish"):
-                if grid[cell].rect.right > self.rect.right - 48:
-                    grid[cell].value = "title"
+        grid.eat_title(self.rect.right - 48)
 
     def draw(self, surface):
         surface.blit(self.image, self.rect)
 
 
-class Cell(object):
-    colors = {
-            "water": (18, 38, 53),
-            "fish": (58, 170, 150),
-            "title-water": (18, 38, 53),
-            "title-fish": (58, 170, 150),
-            "title": (211, 103, 103)} #(255, 255, 255)}
-    def __init__(self, index, topleft, cell_size, value):
-        self.index = index
-        self.rect = pg.Rect(topleft, (cell_size, cell_size))
-        self.value = value
-
-    def draw(self, surface):
-        pg.draw.rect(surface, self.colors[self.value], self.rect)
-
-
 class Grid(object):
+    """
+    The flood of fish behind the title. Cell values live in a
+    (columns, rows) array. Only the frontier, the cells that turned to
+    fish in the last update, can spread, so an update costs time in
+    proportion to the frontier rather than the grid, and nothing at all
+    once the flood is over. Only the cells that changed are repainted on
+    the canvas the grid is drawn from.
+    """
+    colors = [(18, 38, 53), (58, 170, 150), (18, 38, 53), (58, 170, 150),
+                  (211, 103, 103)]
     def __init__(self, topleft, size, cell_size):
         self.rect = pg.Rect(topleft, size)
         self.cell_size = cell_size
-        self.make_cells()
-
-    def make_cells(self):
-        self.cells = {}
-        for x in range(self.rect.width//self.cell_size):
-            for y in range(self.rect.height//self.cell_size):
-                cell = Cell((x, y), (x * self.cell_size, y * self.cell_size),
-                                self.cell_size, "water")
-                self.cells[(x, y)] = cell
+        self.num_columns = self.rect.width // cell_size
+        self.num_rows = self.rect.height // cell_size
+        self.values = np.zeros((self.num_columns, self.num_rows), dtype=np.uint8)
+        self.frontier = np.zeros(0, dtype=np.intp)
+        self.new_fish = []
+        self.title_cells = np.zeros(0, dtype=np.intp)
+        self.changed = []
+        self.canvas = None
+
+    def flat_index(self, x, y):
+        return x * self.num_rows + y
+
+    def add_title(self, cells):
+        """Mark the (x, y) cells in cells as part of the title."""
+        flat = np.array([self.flat_index(x, y) for x, y in cells], dtype=np.intp)
+        self.values.reshape(-1)[flat] = TITLE_WATER
+        self.title_cells = np.union1d(self.title_cells, flat)
+        self.changed.append(flat)
+
+    def add_fish(self, x, y):
+        """Put a fish in cell (x, y), if it's on the grid."""
+        if not (0 <= x < self.num_columns and 0 <= y < self.num_rows):
+            return
+        flat = self.flat_index(x, y)
+        values = self.values.reshape(-1)
+        values[flat] = TITLE_FISH if values[flat] >= TITLE_WATER else FISH
+        self.new_fish.append(flat)
+
+    def eat_title(self, right):
+        """
+        Turn the title cells ending right of x coordinate right, fish or
+        not, to TITLE.
+        """
+        values = self.values.reshape(-1)
+        cells = self.title_cells[self.title_cells // self.num_rows >=
+                                          (right - self.rect.left) // self.cell_size]
+        kinds = values[cells]
+        eaten = cells[(kinds == TITLE_WATER) | (kinds == TITLE_FISH)]
+        values[eaten] = TITLE
+        self.changed.append(eaten)
 
     def update(self):
-        new_fish = []
-        for c in self.cells:
-            if self.cells[c].value in ("fish", "title-fish"):
-                offsets = [(0, -1), (0, 1), (1, 0), (-1, 0)]
-                for off in offsets:
-                    new_fish.append((c[0] + off[0], c[1] + off[1]))
-        for n in new_fish:
-            try:
-                current = self.cells[n].value
-                if current in ("water", "fish"):
-                    new_val = "fish"
-                elif current in ("title-water", "title-fish"):
-                    new_val = "title-fish"
-                elif current == "title":
-                    new_val = "title"
-                self.cells[n].value = new_val
-            except KeyError:
-                pass
+        """Spread every fish on the frontier to the water next to it."""
+        frontier = self.frontier
+        if self.new_fish:
+            frontier = np.concatenate([frontier, self.new_fish])
+            self.changed.append(np.array(self.new_fish, dtype=np.intp))
+            self.new_fish = []
+        if not len(frontier):
+            return
+        values = self.values.reshape(-1)
+        #Fish are the odd values; TITLE cells eaten since don't spread.
+        frontier = frontier[values[frontier] % 2 == 1]
+        xs, ys = np.divmod(frontier, self.num_rows)
+        nx = np.concatenate([xs, xs, xs + 1, xs - 1])
+        ny = np.concatenate([ys - 1, ys + 1, ys, ys])
+        inside = ((nx >= 0) & (nx < self.num_columns) &
+                     (ny >= 0) & (ny < self.num_rows))
+        neighbors = self.flat_index(nx[inside], ny[inside])
+        kinds = values[neighbors]
+        wet = np.unique(neighbors[(kinds == WATER) | (kinds == TITLE_WATER)])
+        values[wet] += 1
+        self.frontier = wet
+        self.changed.append(wet)
 
     def draw(self, surface):
-        for c in self.cells.values():
-            c.draw(surface)
+        if self.canvas is None:
+            self.canvas = pg.Surface(self.rect.size).convert()
+            self.mapped = np.array([self.canvas.map_rgb(color) for color in self.colors],
+                                             dtype=np.uint32)
+            self.changed.append(np.arange(self.values.size))
+        changed = [cells for cells in self.changed if len(cells)]
+        self.changed = []
+        if changed:
+            self.paint(np.concatenate(changed))
+        surface.blit(self.canvas, self.rect)
+
+    def paint(self, cells):
+        """Repaint the flat indexes in cells on the canvas."""
+        xs, ys = np.divmod(cells, self.num_rows)
+        colors = self.mapped[self.values[xs, ys]]
+        size = self.cell_size
+        #pixels2d indexes the canvas [x, y] and locks it until the view is
+        #deleted. Splitting both axes gives a view of size x size blocks.
+        view = pg.surfarray.pixels2d(self.canvas)
+        blocks = view[:self.num_columns * size, :self.num_rows * size].reshape(
+                self.num_columns, size, self.num_rows, size)
+        blocks[xs, :, ys, :] = colors[:, None, None]
+        del blocks, view
 
 
 class TitleScreen(tools._State):
@@ -123,10 +173,9 @@ class TitleScreen(tools._State):
             "OXOXOOXOOOXOOOOOOXOOOOXXXOOXOOXO"]
         left = 20
         top = 19
-        for y, line in enumerate(lines):
-            for x, char in enumerate(line):
-                if char == "X":
-                    self.grid.cells[(left + x, top + y)].value = "title-water"
+        self.grid.add_title([(left + x, top + y)
+                                     for y, line in enumerate(lines)
+                                     for x, char in enumerate(line) if char == "X"])
 
     def get_event(self,event):
         if event.type == pg.QUIT:
@@ -144,8 +193,8 @@ class TitleScreen(tools._State):
         if self.timer >= self.tick_length:
             self.timer -= self.tick_length
 
-            self.fish.update(self.grid.cells)
-            self.shark.update(self.grid.cells)
+            self.fish.update(self.grid)
+            self.shark.update(self.grid)
             self.grid.update()
 
     def draw(self, surface):
@@ -0,0 +1,180 @@
+"""
+Parameter sweeps over headless Wa-Tor runs. Every combination of the
+swept params is run once per seed in a pool of worker processes, and a
+summary of each run is appended to a JSON-lines results file as soon as
+it finishes. Runs already in the results file are skipped, so an
+interrupted sweep picks up where it stopped when started again.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from . import headless
+
+
+def parse_range(value):
+    """
+    Return the list of values for a swept param. value can be a list, a
+    single value or a "start:stop[:step]" string (stop is inclusive).
+    """
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and ":" in value:
+        parts = [int(x) for x in value.split(":")]
+        start, stop = parts[:2]
+        step = parts[2] if len(parts) > 2 else 1
+        return list(range(start, stop + 1, step))
+    return [value]
+
+
+def make_jobs(spec):
+    """
+    Return a list of (params, seed, num_ticks) jobs for every combination
+    of the ranges in spec, for every seed.
+    """
+    base = headless.make_params(spec.get("base"))
+    #Each job's seed is passed separately.
+    del base["seed"]
+    names = sorted(spec.get("ranges", {}))
+    ranges = [parse_range(spec["ranges"][name]) for name in names]
+    seeds = spec.get("seeds", 1)
+    if not isinstance(seeds, list):
+        seeds = list(range(seeds))
+    jobs = []
+    for combo in itertools.product(*ranges):
+        params = dict(base)
+        params.update(zip(names, combo))
+        for seed in seeds:
+            jobs.append((params, seed, spec.get("ticks", 1000)))
+    return jobs
+
+
+def job_key(params, seed, num_ticks):
+    return json.dumps([params, seed, num_ticks], sort_keys=True)
+
+
+def extinction_tick(series, column):
+    """Return the first tick at which series[column] hits zero, or None."""
+    for row in series:
+        if row[column] == 0:
+            return row[0]
+    return None
+
+
+def oscillation_period(values):
+    """
+    Estimate the dominant period, in ticks, of a population series from
+    the autocorrelation of its second half (skipping the initial
+    transient). Returns None if the series does not oscillate.
+    """
+    x = np.asarray(values[len(values) // 2:], dtype=float)
+    x -= x.mean()
+    if len(x) < 4 or not x.any():
+        return None
+    corr = np.correlate(x, x, "full")[len(x) - 1:]
+    negative = np.flatnonzero(corr < 0)
+    if not len(negative):
+        return None
+    lag = negative[0] + int(np.argmax(corr[negative[0]:]))
+    if corr[lag] <= 0:
+        return None
+    return int(lag)
+
+
+def summarize(series):
+    fish = [row[1] for row in series]
+    sharks = [row[2] for row in series]
+    return {
+            "fish extinction tick": extinction_tick(series, 1),
+            "shark extinction tick": extinction_tick(series, 2),
+            "fish period": oscillation_period(fish),
+            "shark period": oscillation_period(sharks),
+            "mean fish": sum(fish) / float(len(fish)),
+            "mean sharks": sum(sharks) / float(len(sharks))}
+
+
+def run_job(job):
+    """Run a single sweep job in a worker process and summarize it."""
+    params, seed, num_ticks = job
+    result = {"params": params, "seed": seed, "ticks": num_ticks}
+    #The sweep already keeps every core busy, and pool workers can't
+    #start processes of their own, so partitioned runs step their strips
+    #in this process.
+    series = headless.run(dict(params, seed=seed, workers=1), num_ticks)
+    result.update(summarize(series))
+    return result
+
+
+def completed_keys(path):
+    """Return the keys of the runs already recorded in the results file."""
+    keys = set()
+    if not os.path.exists(path):
+        return keys
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                #A partial line left by an interrupted sweep.
+                continue
+            keys.add(job_key(result["params"], result["seed"], result["ticks"]))
+    return keys
+
+
+def drop_partial_line(path):
+    """
+    Cut a partial last line (one without a newline, left by an
+    interrupted sweep) off the results file, so the next result appended
+    starts a line of its own.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def sweep(spec, results_path, processes=None):
+    """
+    Run every job in spec that is not already in results_path across a
+    pool of processes (one per core by default), appending each result
+    as a JSON line. Returns the number of runs completed.
+    """
+    drop_partial_line(results_path)
+    done = completed_keys(results_path)
+    jobs = [job for job in make_jobs(spec) if job_key(*job) not in done]
+    if not jobs:
+        return 0
+    pool = multiprocessing.Pool(processes)
+    try:
+        with open(results_path, "a") as f:
+            for result in pool.imap_unordered(run_job, jobs):
+                f.write(json.dumps(result, sort_keys=True) + "\n")
+                f.flush()
+    finally:
+        pool.terminate()
+        pool.join()
+    return len(jobs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            description="Run a Wa-Tor parameter sweep across all cores.")
+    parser.add_argument("spec",
+                                  help="JSON sweep spec with \"base\", \"ranges\", "
+                                         "\"seeds\" and \"ticks\"")
+    parser.add_argument("-o", "--output", default="sweep.jsonl",
+                                  help="JSON-lines results file (default sweep.jsonl)")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                                  help="worker processes (default one per core)")
+    args = parser.parse_args(argv)
+    with open(args.spec) as f:
+        spec = json.load(f)
+    sweep(spec, args.output, args.processes)
+    return 0
@@ -5,9 +5,13 @@ for States.  Also contained here are resource loading functions.
 
 import os
 import copy
+import functools
+import time
 
 import pygame as pg
 
+from .components.profiler import PROFILER, ProfileOverlay
+
 
 class Control(object):
     """Control class for entire project. Contains the game loop, and contains
@@ -26,6 +30,7 @@ class Control(object):
         self.state_name = None
         self.state = None
         self.fullscreen = False
+        self.profile_overlay = None
 
     def setup_states(self, state_dict, start_state):
         """Given a dictionary of States and a State to start in,
@@ -46,7 +51,8 @@ class Control(object):
         self.state.update(dt)
         
     def draw(self):
-        self.state.draw(self.screen)    
+        """Draw the current State. Returns the State's dirty rects, if any."""
+        return self.state.draw(self.screen)
 
     def flip_state(self):
         """When a State changes to done necessary startup and cleanup functions
@@ -69,6 +75,8 @@ class Control(object):
             elif event.type == pg.KEYUP:
                 self.keys = pg.key.get_pressed()
                 self.toggle_fullscreen(event.key)
+                self.toggle_profile_overlay(event.key)
+                self.dump_profile(event.key)
             self.state.get_event(event)
 
     def toggle_show_fps(self, key):
@@ -78,6 +86,20 @@ class Control(object):
             if not self.show_fps:
                 pg.display.set_caption(self.caption)
 
+    def toggle_profile_overlay(self, key):
+        """Press f6 to show/hide the per-phase frame timings."""
+        if key == pg.K_F6:
+            if self.profile_overlay is None:
+                self.profile_overlay = ProfileOverlay(PROFILER)
+            else:
+                self.profile_overlay = None
+                self.state.invalidate()
+
+    def dump_profile(self, key):
+        """Press f7 to write the buffered frame timings to a CSV file."""
+        if key == pg.K_F7:
+            PROFILER.write_csv(time.strftime("profile-%Y%m%d-%H%M%S.csv"))
+
     def toggle_fullscreen(self, key):
         if key == pg.K_F1:
             screen_size = pg.display.get_surface().get_size()
@@ -86,15 +108,30 @@ class Control(object):
                 self.screen = pg.display.set_mode(screen_size, pg.FULLSCREEN)
             else:
                 self.screen = pg.display.set_mode(screen_size)
+            self.state.invalidate()
 
     def main(self):
         """Main loop for entire program."""
         while not self.done:
-            time_delta = self.clock.tick(self.fps)
-            self.event_loop()
-            self.update(time_delta)
-            self.draw()
-            pg.display.update()
+            with PROFILER.phase("idle"):
+                time_delta = self.clock.tick(self.fps)
+            with PROFILER.phase("events"):
+                self.event_loop()
+            with PROFILER.phase("update"):
+                self.update(time_delta)
+            with PROFILER.phase("draw"):
+                dirty_rects = self.draw()
+            if self.profile_overlay is not None:
+                self.profile_overlay.update(time_delta)
+                overlay_rect = self.profile_overlay.draw(self.screen)
+                if dirty_rects is not None:
+                    dirty_rects.append(overlay_rect)
+            with PROFILER.phase("display"):
+                if dirty_rects is None:
+                    pg.display.update()
+                else:
+                    pg.display.update(dirty_rects)
+            PROFILER.end_frame()
             if self.show_fps:
                 fps = self.clock.get_fps()
                 with_fps = "{} - {:.2f} FPS".format(self.caption, fps)
@@ -137,6 +174,14 @@ class _State(object):
         pass
 
     def draw(self, surface):
+        """Draw the state to surface. States that only redraw part of the
+        screen can return a list of the rects that changed; returning
+        None updates the whole display."""
+        pass
+
+    def invalidate(self):
+        """Called when the display has been reset (e.g. fullscreen was
+        toggled) and everything must be redrawn on the next frame."""
         pass
         
     def render_font(self, font, msg, color, center):
@@ -172,6 +217,44 @@ class _KwargMixin(object):
 
 
 ### Resource loading functions.
+class LazyAssets(dict):
+    """
+    A dict of assets that are only loaded the first time they are looked
+    up. loaders maps each asset's name to a function of no arguments that
+    loads it; a loaded asset is kept. Assets can also be stored directly,
+    as in a plain dict.
+    """
+    def __init__(self, loaders):
+        super(LazyAssets, self).__init__()
+        self.loaders = loaders
+
+    def __missing__(self, name):
+        asset = self.loaders[name]()
+        self[name] = asset
+        return asset
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self.loaders
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def add(self, name, loader):
+        """Load name with loader when it is first looked up."""
+        self.loaders[name] = loader
+
+
+def load_gfx(path, colorkey=(0,0,0)):
+    """Load a single graphic, converting it as load_all_gfx does."""
+    img = pg.image.load(path)
+    if img.get_alpha():
+        img = img.convert_alpha()
+    else:
+        img = img.convert()
+        img.set_colorkey(colorkey)
+    return img
+
+
 def load_all_gfx(directory,colorkey=(0,0,0),accept=(".png",".jpg",".bmp")):
     """Load all graphics with extensions in the accept argument.  If alpha
     transparency is found in the image the image will be converted using
@@ -181,16 +264,17 @@ def load_all_gfx(directory,colorkey=(0,0,0),accept=(".png",".jpg",".bmp")):
     for pic in os.listdir(directory):
         name,ext = os.path.splitext(pic)
         if ext.lower() in accept:
-            img = pg.image.load(os.path.join(directory, pic))
-            if img.get_alpha():
-                img = img.convert_alpha()
-            else:
-                img = img.convert()
-                img.set_colorkey(colorkey)
-            graphics[name]=img
+            graphics[name] = load_gfx(os.path.join(directory, pic), colorkey)
     return graphics
 
 
+def lazy_gfx(directory, colorkey=(0,0,0), accept=(".png",".jpg",".bmp")):
+    """Like load_all_gfx, but each graphic is loaded on first use."""
+    paths = load_all_music(directory, accept)
+    return LazyAssets({name: functools.partial(load_gfx, path, colorkey)
+                               for name, path in paths.items()})
+
+
 def load_all_music(directory, accept=(".wav", ".mp3", ".ogg", ".mdi")):
     """Create a dictionary of paths to music files in given directory
     if their extensions are in accept."""
@@ -226,6 +310,13 @@ def load_all_sfx(directory, accept=(".wav", ".mp3", ".ogg", ".mdi")):
     return effects
 
 
+def lazy_sfx(directory, accept=(".wav", ".mp3", ".ogg", ".mdi")):
+    """Like load_all_sfx, but each sound is loaded on first use."""
+    paths = load_all_music(directory, accept)
+    return LazyAssets({name: functools.partial(pg.mixer.Sound, path)
+                               for name, path in paths.items()})
+
+
 def strip_from_sheet(sheet, start, size, columns, rows=1):
     """Strips individual frames from a sprite sheet given a start location,
     sprite size, and number of columns and rows."""
@@ -0,0 +1,38 @@
+import time
+import unittest
+
+from data.components.sim_thread import SimThread
+
+
+class CountingWorld(object):
+    """Just enough of a world for a SimThread: counts its ticks."""
+    def __init__(self):
+        self.num_fish = 0
+        self.num_sharks = 0
+        self.ticks = 0
+        self.frame = None
+
+    def update(self):
+        self.ticks += 1
+
+    def capture_frame(self):
+        return self.ticks
+
+
+class TickLengthTest(unittest.TestCase):
+    def test_shorter_tick_starts_at_once(self):
+        world = CountingWorld()
+        sim = SimThread(world, 2000)
+        sim.start()
+        try:
+            time.sleep(0.1)
+            start = world.ticks
+            sim.set_tick_length(60)
+            time.sleep(0.25)
+            self.assertGreaterEqual(world.ticks - start, 2)
+        finally:
+            sim.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from data import sweep
+
+
+SPEC = {"base": {"columns": 20, "rows": 10, "num fish": 60, "num sharks": 5},
+        "ranges": {"shark starve time": [2, 4]},
+        "seeds": 2,
+        "ticks": 20}
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "sweep.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read_results(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_resume_after_truncated_line(self):
+        self.assertEqual(sweep.sweep(SPEC, self.path, 1), 4)
+        with open(self.path, "rb+") as f:
+            size = len(f.read())
+            f.truncate(size - 10)
+        self.assertEqual(sweep.sweep(SPEC, self.path, 1), 1)
+        self.assertEqual(len(self.read_results()), 4)
+        self.assertEqual(sweep.sweep(SPEC, self.path, 1), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,13 @@
 #!/usr/bin/python2
 
 import sys
-import pygame as pg
-from data.main import main
 
 
 if __name__ == '__main__':
+    #Imported here, not at the top: worker processes started with "spawn"
+    #import this module as __mp_main__ and must not open a window.
+    import pygame as pg
+    from data.main import main
     main()
     pg.quit()
     sys.exit()
\ No newline at end of file
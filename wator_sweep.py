@@ -0,0 +1,8 @@
+#!/usr/bin/python2
+
+import sys
+from data.sweep import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())